@@ -1,8 +1,17 @@
-from typing import List, Optional
+from typing import List, Literal, Optional
 
-from fastapi import APIRouter, Depends, Query
-from schemas.response_schemas import RepoActivityResponse, RepoResponse
+from fastapi import APIRouter, Depends, Header, Query
+from fastapi.responses import StreamingResponse
+from schemas.request_schemas import ActivityBatchRequest
+from schemas.response_schemas import (
+    ActivityBatchResponse,
+    RepoActivityResponse,
+    RepoHistoryResponse,
+    RepoResponse,
+)
 from services.repo_service import RepoService, get_repo_service
+from services.top100_encoder import build_top100_response
+from services.top100_query import build_top100_page_response
 
 router = APIRouter()
 
@@ -11,6 +20,19 @@ router = APIRouter()
 Маршруты роутера, добавил схемы ответов, а также краткое описание эндпоинта.
 Используют Depends для повышения переиспользования кода. Возвращают результат
 работы RepoService
+
+/top100 отдаёт заранее сериализованный и сжатый ответ с ETag,
+на совпадающий If-None-Match отвечает 304. Если передан хотя бы один
+из language, min_stars, max_stars, fields, limit или cursor, ответ
+собирается запросом в базу: только нужные строки и колонки,
+курсор на следующую страницу в заголовке X-Next-Cursor.
+
+/activity с ?stream=true или Accept: application/x-ndjson отдаёт
+прогресс по мере скачивания страниц, а в конце итог. С breakdown=top_n
+в ответе есть top_authors: top_n авторов с числом их коммитов.
+
+POST /activity:batch считает активность для списка репозиториев за один
+период и отдаёт результат или ошибку по каждому в одном ответе.
 """
 
 @router.get(
@@ -21,15 +43,38 @@ router = APIRouter()
 async def get_top100(
     sort_by: Optional[str] = Query(None, description="Field to sort by"),
     sort_order: Optional[str] = Query("asc", description="Sort order: asc or desc"),
+    language: Optional[str] = Query(None, description="Only repositories in this language"),
+    min_stars: Optional[int] = Query(None, ge=0, description="Minimum number of stars"),
+    max_stars: Optional[int] = Query(None, ge=0, description="Maximum number of stars"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+    limit: Optional[int] = Query(None, ge=1, le=100, description="Page size"),
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header"),
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None),
     repo_service: RepoService = Depends(get_repo_service)
 ):
-    return await repo_service.get_top100(sort_by=sort_by, sort_order=sort_order)
+    if any(param is not None for param in (language, min_stars, max_stars, fields, limit, cursor)):
+        rows, next_cursor = await repo_service.query_top100(
+            language=language,
+            min_stars=min_stars,
+            max_stars=max_stars,
+            fields=fields,
+            sort_by=sort_by,
+            sort_order=sort_order,
+            limit=limit or 100,
+            cursor=cursor,
+        )
+        return build_top100_page_response(rows, next_cursor)
+
+    encoded = await repo_service.get_top100_encoded(sort_by=sort_by, sort_order=sort_order)
+    return build_top100_response(encoded, if_none_match, accept_encoding)
 
 
 
 @router.get(
     "/{owner}/{repo}/activity",
     response_model=RepoActivityResponse,
+    response_model_exclude_none=True,
     response_description="Repository activity details",
 )
 async def get_repo_info(
@@ -37,6 +82,45 @@ async def get_repo_info(
     repo: str,
     since: str = Query(..., description="Start date in YYYY-MM-DD format"),
     until: str = Query(..., description="End date in YYYY-MM-DD format"),
+    stream: bool = Query(False, description="Stream progress as NDJSON"),
+    breakdown: Optional[Literal["top_n"]] = Query(None, description="top_n adds per-author commit counts"),
+    top_n: int = Query(10, ge=1, le=100, description="Number of authors in the breakdown"),
+    accept: Optional[str] = Header(None),
+    repo_service: RepoService = Depends(get_repo_service),
+):
+    top_n = top_n if breakdown == "top_n" else None
+    if stream or "application/x-ndjson" in (accept or ""):
+        return StreamingResponse(
+            repo_service.stream_repo_info(owner, repo, since, until, top_n),
+            media_type="application/x-ndjson",
+        )
+    return await repo_service.get_repo_info(owner, repo, since, until, top_n)
+
+
+@router.post(
+    "/activity:batch",
+    response_model=ActivityBatchResponse,
+    response_model_exclude_none=True,
+    response_description="Activity details or errors per repository",
+)
+async def get_repos_info(
+    request: ActivityBatchRequest,
+    repo_service: RepoService = Depends(get_repo_service),
+):
+    return await repo_service.get_repos_info(request.repos, request.since, request.until)
+
+
+@router.get(
+    "/{owner}/{repo}/history",
+    response_model=RepoHistoryResponse,
+    response_description="Downsampled star/rank history of the repository",
+)
+async def get_repo_history(
+    owner: str,
+    repo: str,
+    since: Optional[str] = Query(None, description="Start date in YYYY-MM-DD format, defaults to 30 days ago"),
+    until: Optional[str] = Query(None, description="End date in YYYY-MM-DD format, defaults to now"),
+    points: int = Query(200, ge=1, le=2000, description="Approximate number of points to return"),
     repo_service: RepoService = Depends(get_repo_service),
 ):
-    return await repo_service.get_repo_info(owner, repo, since, until)
+    return await repo_service.get_repo_history(owner, repo, since, until, points)
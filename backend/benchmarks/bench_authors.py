@@ -0,0 +1,131 @@
+import argparse
+import heapq
+import json
+import random
+import sys
+import time
+import tracemalloc
+from typing import Callable, List
+
+import orjson
+from services.author_counter import AuthorCounter
+
+"""
+Память и время подсчёта авторов на синтетической истории коммитов.
+
+Страницы ответа гитхаба заранее сериализуются в json, а в каждом режиме
+разбираются заново, как при настоящем обходе. Сравниваются:
+
+- formatted_set: множество строк "name <email>" по страницам, как было
+  в extract_authors (только список авторов, без числа коммитов);
+- tuple_counter: счётчик с ключом (name, email) и heapq для top N;
+- interned_counter: то же, но строки ключа через sys.intern;
+- author_counter: AuthorCounter (ключ "name <email>" и heapq).
+
+Во всех режимах, кроме formatted_set, в результате и счётчик,
+и список авторов для ответа, и top N.
+
+peak_kib это пик tracemalloc за обход (включая разбор одной страницы),
+retained_kib то, что остаётся занято результатом агрегации.
+
+    python -m benchmarks.bench_authors --commits 100000 --authors 5000
+"""
+
+
+def synthetic_pages(commits: int, authors: int, per_page: int, seed: int) -> List[bytes]:
+    rng = random.Random(seed)
+    people = [(f"Contributor {index}", f"contributor{index}@example.com") for index in range(authors)]
+    weights = [1 / (index + 1) for index in range(authors)]
+    picked = rng.choices(people, weights=weights, k=commits)
+    pages = []
+    for start in range(0, commits, per_page):
+        page = [
+            {
+                "sha": f"{start + offset:040x}",
+                "commit": {
+                    "author": {"name": name, "email": email, "date": "2024-01-01T00:00:00Z"},
+                    "committer": {"name": name, "email": email, "date": "2024-01-01T00:00:00Z"},
+                    "message": "Synthetic commit",
+                },
+            }
+            for offset, (name, email) in enumerate(picked[start:start + per_page])
+        ]
+        pages.append(orjson.dumps(page))
+    return pages
+
+
+def formatted_set(pages: List[bytes], top_n: int):
+    authors = set()
+    for raw in pages:
+        page = orjson.loads(raw)
+        authors.update(
+            f"{commit_info['commit']['author']['name']} <{commit_info['commit']['author']['email']}>"
+            for commit_info in page
+        )
+    return list(authors), None
+
+
+def tuple_counter(pages: List[bytes], top_n: int, intern: bool = False):
+    counts = {}
+    for raw in pages:
+        for commit_info in orjson.loads(raw):
+            author = commit_info["commit"]["author"]
+            key = (author["name"], author["email"])
+            if intern:
+                key = (sys.intern(key[0]), sys.intern(key[1]))
+            counts[key] = counts.get(key, 0) + 1
+    top = heapq.nsmallest(top_n, counts.items(), key=lambda item: (-item[1], item[0]))
+    return counts, [f"{name} <{email}>" for name, email in counts], top
+
+
+def interned_counter(pages: List[bytes], top_n: int):
+    return tuple_counter(pages, top_n, intern=True)
+
+
+def author_counter(pages: List[bytes], top_n: int):
+    counter = AuthorCounter()
+    for raw in pages:
+        counter.add_page(orjson.loads(raw))
+    return counter, counter.authors(), counter.top(top_n)
+
+
+def measure(name: str, bench: Callable, pages: List[bytes], top_n: int) -> dict:
+    # Прогрев, чтобы в замер не попали кэши и аллокации первого запуска
+    bench(pages[:10], top_n)
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    result = bench(pages, top_n)
+    elapsed = time.perf_counter() - started
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return {
+        "mode": name,
+        "seconds": round(elapsed, 4),
+        "peak_kib": round((peak - baseline) / 1024, 1),
+        "retained_kib": round((current - baseline) / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--commits", type=int, default=100_000)
+    parser.add_argument("--authors", type=int, default=5_000)
+    parser.add_argument("--per-page", type=int, default=100)
+    parser.add_argument("--top-n", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    pages = synthetic_pages(args.commits, args.authors, args.per_page, args.seed)
+    for name, bench in (
+        ("formatted_set", formatted_set),
+        ("tuple_counter", tuple_counter),
+        ("interned_counter", interned_counter),
+        ("author_counter", author_counter),
+    ):
+        print(json.dumps({"commits": args.commits, "authors": args.authors, **measure(name, bench, pages, args.top_n)}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import argparse
+import asyncio
+import json
+import time
+from typing import List
+
+import aiohttp
+from aiohttp import web
+from benchmarks.fake_github import create_app
+from benchmarks.stats import percentiles
+from core.http_client import HttpClient
+
+"""
+Сравнение задержки запроса к апи коммитов: новая ClientSession на каждый
+запрос (как было в fetch_commits) против одной общей сессии HttpClient
+с коннектором и таймаутами из настроек (как теперь в lifespan).
+
+По умолчанию поднимает локальную заглушку гитхаба. Через --url можно
+направить на настоящий апи, тогда разница за счёт TLS и DNS будет заметнее:
+
+    python -m benchmarks.bench_http_session --requests 200
+    python -m benchmarks.bench_http_session --url https://api.github.com/repos/python/cpython/commits
+"""
+
+
+async def per_call_session(url: str, params: dict, count: int) -> List[float]:
+    samples = []
+    for _ in range(count):
+        started = time.perf_counter()
+        async with aiohttp.ClientSession() as session:
+            async with session.get(url, params=params) as response:
+                await response.read()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+async def shared_session(url: str, params: dict, count: int) -> List[float]:
+    client = HttpClient()
+    await client.start()
+    samples = []
+    try:
+        for _ in range(count):
+            started = time.perf_counter()
+            async with client.session.get(url, params=params) as response:
+                await response.read()
+            samples.append(time.perf_counter() - started)
+    finally:
+        await client.close()
+    return samples
+
+
+async def run(args):
+    runner = None
+    url = args.url
+    if url is None:
+        runner = web.AppRunner(create_app(interval=600, authors=50, latency=0))
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", args.port).start()
+        url = f"http://127.0.0.1:{args.port}/repos/bench/repo/commits"
+
+    params = {"per_page": 100}
+    try:
+        for name, bench in (("per_call_session", per_call_session), ("shared_session", shared_session)):
+            samples = await bench(url, params, args.requests)
+            print(json.dumps({"mode": name, "requests": args.requests, **percentiles(samples)}))
+    finally:
+        if runner is not None:
+            await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default=None)
+    parser.add_argument("--port", type=int, default=9001)
+    parser.add_argument("--requests", type=int, default=200)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
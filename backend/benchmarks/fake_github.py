@@ -0,0 +1,147 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+from datetime import datetime, timezone
+
+from aiohttp import web
+
+"""
+Локальная заглушка апи коммитов гитхаба для тестов и бенчмарков.
+
+Коммиты не хранятся, а вычисляются: у каждого репозитория коммит
+появляется раз в interval секунд, начиная с эпохи. Поэтому любые
+пересекающиеся окна since/until отдают одни и те же коммиты с теми же sha,
+как и настоящий гитхаб. Ответ отдаётся страницами по per_page,
+новые коммиты первыми, с заголовком Link (rel="next"/rel="last").
+
+Запуск:
+
+    python -m benchmarks.fake_github --port 9000 --interval 600 --latency-ms 50
+
+Бэкенд направляется на заглушку через GH_BASE_URL=http://localhost:9000/repos/
+
+С --rate-limit заглушка считает запросы по каждому токену из Authorization,
+отдаёт X-RateLimit-Limit/Remaining/Reset и отвечает 403
+"API rate limit exceeded", когда лимит токена на окно исчерпан.
+
+Каждая страница отдаётся с ETag (хэш тела), и на совпадающий
+If-None-Match заглушка отвечает 304 без тела.
+"""
+
+
+def parse_time(value: str, default: int) -> int:
+    if not value:
+        return default
+    value = value.replace("Z", "+00:00")
+    if "T" not in value:
+        value = f"{value}T00:00:00+00:00"
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp())
+
+
+def build_commit(full_name: str, timestamp: int, authors: int) -> dict:
+    sha = hashlib.sha1(f"{full_name}:{timestamp}".encode()).hexdigest()
+    author_id = int(sha[:8], 16) % authors
+    committed_at = datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    person = {
+        "name": f"Author {author_id}",
+        "email": f"author{author_id}@example.com",
+        "date": committed_at,
+    }
+    return {
+        "sha": sha,
+        "commit": {"author": person, "committer": person, "message": "commit"},
+    }
+
+
+def create_app(
+    interval: int,
+    authors: int,
+    latency: float,
+    rate_limit: int = 0,
+    rate_window: int = 3600,
+) -> web.Application:
+    usage = {}
+
+    def rate_limit_headers(request: web.Request) -> dict:
+        now = int(datetime.now(timezone.utc).timestamp())
+        token = request.headers.get("Authorization", "")
+        window_start, used = usage.get(token, (now, 0))
+        if now >= window_start + rate_window:
+            window_start, used = now, 0
+        usage[token] = (window_start, used + 1)
+        return {
+            "X-RateLimit-Limit": str(rate_limit),
+            "X-RateLimit-Remaining": str(max(rate_limit - used - 1, 0)),
+            "X-RateLimit-Reset": str(window_start + rate_window),
+            "X-RateLimit-Exceeded": "1" if used >= rate_limit else "",
+        }
+
+    async def commits(request: web.Request) -> web.Response:
+        if latency:
+            await asyncio.sleep(latency)
+
+        headers = {}
+        if rate_limit:
+            headers = rate_limit_headers(request)
+            if headers.pop("X-RateLimit-Exceeded"):
+                return web.json_response(
+                    {"message": "API rate limit exceeded"}, status=403, headers=headers
+                )
+
+        full_name = f"{request.match_info['owner']}/{request.match_info['repo']}"
+        now = int(datetime.now(timezone.utc).timestamp())
+        since = parse_time(request.query.get("since"), 0)
+        until = min(parse_time(request.query.get("until"), now), now)
+        per_page = min(int(request.query.get("per_page", 30)), 100)
+        page = max(int(request.query.get("page", 1)), 1)
+
+        newest = until // interval * interval
+        oldest = math.ceil(since / interval) * interval
+        total = max((newest - oldest) // interval + 1, 0)
+        last_page = max(math.ceil(total / per_page), 1)
+
+        start = (page - 1) * per_page
+        timestamps = [newest - i * interval for i in range(start, min(start + per_page, total))]
+
+        links = []
+        if page < last_page:
+            links.append(f'<{request.url.update_query(page=page + 1)}>; rel="next"')
+            links.append(f'<{request.url.update_query(page=last_page)}>; rel="last"')
+        if links:
+            headers["Link"] = ", ".join(links)
+
+        body = json.dumps([build_commit(full_name, ts, authors) for ts in timestamps])
+        headers["ETag"] = f'"{hashlib.sha1(body.encode()).hexdigest()}"'
+        if request.headers.get("If-None-Match") == headers["ETag"]:
+            return web.Response(status=304, headers=headers)
+        return web.Response(text=body, content_type="application/json", headers=headers)
+
+    app = web.Application()
+    app.router.add_get("/repos/{owner}/{repo}/commits", commits)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--interval", type=int, default=600, help="Seconds between commits")
+    parser.add_argument("--authors", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--rate-limit", type=int, default=0, help="Requests per token per window, 0 disables")
+    parser.add_argument("--rate-window", type=int, default=3600)
+    args = parser.parse_args()
+
+    app = create_app(
+        args.interval, args.authors, args.latency_ms / 1000, args.rate_limit, args.rate_window
+    )
+    web.run_app(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
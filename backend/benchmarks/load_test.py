@@ -0,0 +1,230 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from datetime import date, timedelta
+from typing import List, Tuple
+
+import aiohttp
+import asyncpg
+from aiohttp import web
+from benchmarks.fake_github import create_app
+from benchmarks.stats import percentiles
+
+"""
+Нагрузочный тест бэкенда.
+
+Поднимает заглушку гитхаба (fake_github) с заданной задержкой и плотностью
+коммитов, запускает приложение через uvicorn, направленное на заглушку и на
+локальный постгрес (DB_* из окружения), и гоняет конкурентную нагрузку на
+/api/repos/top100 (все варианты сортировки) и /api/repos/{owner}/{repo}/activity.
+Результат: пропускная способность и перцентили задержки по каждому сценарию,
+в json (stdout или --output), чтобы сравнивать прогоны в CI.
+
+С --seed таблица top100 очищается и заполняется синтетическими данными,
+поэтому запускать только на тестовой базе:
+
+    DB_NAME=bench ... GH_AUTH_TOKEN=x python -m benchmarks.load_test --seed --requests 2000
+
+Чтобы /activity каждый раз реально ходил в заглушку, запросы раскидываются
+по --activity-repos разным репозиториям, а кэш результатов выключен.
+Кэш ответов по ETag (GH_CACHE_PATH) тоже выключен: иначе повторные
+запросы получали бы 304 и замерялась бы отдача из sqlite, а не обход.
+Фоновый прогрев тоже выключен, чтобы он не ходил в заглушку во время замера.
+"""
+
+SORT_FIELDS = (
+    "repo", "owner", "position_cur", "position_prev",
+    "stars", "watchers", "forks", "open_issues", "language"
+)
+
+CREATE_TOP100 = """
+    CREATE TABLE IF NOT EXISTS top100 (
+        repo TEXT NOT NULL,
+        owner TEXT NOT NULL,
+        position_cur INTEGER NOT NULL DEFAULT 0,
+        position_prev INTEGER NOT NULL DEFAULT 0,
+        stars INTEGER NOT NULL,
+        watchers INTEGER NOT NULL,
+        forks INTEGER NOT NULL,
+        open_issues INTEGER NOT NULL,
+        language TEXT
+    )
+"""
+
+
+async def seed_top100():
+    connection = await asyncpg.connect(
+        user=os.environ["DB_USER"],
+        password=os.environ["DB_PASS"],
+        host=os.environ["DB_HOST"],
+        port=int(os.environ["DB_PORT"]),
+        database=os.environ["DB_NAME"],
+    )
+    try:
+        await connection.execute(CREATE_TOP100)
+        await connection.execute("TRUNCATE top100")
+        rnd = random.Random(0)
+        rows = sorted(
+            (
+                (f"owner{i}/repo{i}", f"owner{i}", 0, 0, rnd.randint(50000, 400000),
+                 rnd.randint(50000, 400000), rnd.randint(0, 80000), rnd.randint(0, 10000),
+                 rnd.choice(["Python", "Go", "Rust", None]))
+                for i in range(100)
+            ),
+            key=lambda row: row[4],
+            reverse=True,
+        )
+        await connection.copy_records_to_table(
+            "top100",
+            records=[(*row[:2], position, *row[3:]) for position, row in enumerate(rows, start=1)],
+            columns=["repo", "owner", "position_cur", "position_prev", "stars",
+                     "watchers", "forks", "open_issues", "language"],
+        )
+    finally:
+        await connection.close()
+
+
+async def wait_ready(base_url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            try:
+                async with session.get(f"{base_url}/api/openapi.json") as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("Backend did not start in time")
+
+
+async def drive(
+    session: aiohttp.ClientSession, urls: List[str], concurrency: int
+) -> Tuple[List[float], int, float]:
+    samples: List[float] = []
+    errors = 0
+    queue = iter(urls)
+
+    async def worker():
+        nonlocal errors
+        for url in queue:
+            started = time.perf_counter()
+            try:
+                async with session.get(url) as response:
+                    await response.read()
+                    if response.status >= 400:
+                        errors += 1
+            except aiohttp.ClientError:
+                errors += 1
+            samples.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return samples, errors, time.perf_counter() - started
+
+
+def scenarios(args, base_url: str) -> dict:
+    top100 = {"top100_default": [f"{base_url}/api/repos/top100"] * args.requests}
+    for field in SORT_FIELDS:
+        for order in ("asc", "desc"):
+            top100[f"top100_{field}_{order}"] = [
+                f"{base_url}/api/repos/top100?sort_by={field}&sort_order={order}"
+            ] * args.requests
+
+    until = date.today() - timedelta(days=1)
+    since = until - timedelta(days=args.activity_days)
+    activity_requests = max(args.requests // 10, 1)
+    top100["activity"] = [
+        f"{base_url}/api/repos/bench/repo{i % args.activity_repos}/activity"
+        f"?since={since.isoformat()}&until={until.isoformat()}"
+        for i in range(activity_requests)
+    ]
+    return top100
+
+
+async def run(args) -> dict:
+    runner = web.AppRunner(
+        create_app(args.github_interval, args.github_authors, args.github_latency_ms / 1000)
+    )
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", args.github_port).start()
+
+    if args.seed:
+        await seed_top100()
+
+    env = {
+        **os.environ,
+        "GH_BASE_URL": f"http://127.0.0.1:{args.github_port}/repos/",
+        "ACTIVITY_CACHE_TTL": "0",
+        "GH_CACHE_PATH": "",
+        "ACTIVITY_STORE_ENABLED": "true" if args.activity_store else "false",
+        "PREWARM_ENABLED": "false",
+    }
+    backend = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+         "--port", str(args.port), "--workers", str(args.workers), "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env=env,
+    )
+    base_url = f"http://127.0.0.1:{args.port}"
+    results = {}
+    try:
+        await wait_ready(base_url)
+        connector = aiohttp.TCPConnector(limit=args.concurrency)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            for name, urls in scenarios(args, base_url).items():
+                samples, errors, elapsed = await drive(session, urls, args.concurrency)
+                results[name] = {
+                    "requests": len(urls),
+                    "errors": errors,
+                    "rps": round(len(urls) / elapsed, 1),
+                    **percentiles(samples),
+                }
+    finally:
+        backend.terminate()
+        backend.wait(timeout=10)
+        await runner.cleanup()
+
+    return {
+        "config": {
+            "concurrency": args.concurrency,
+            "workers": args.workers,
+            "github_latency_ms": args.github_latency_ms,
+            "activity_pages": -(-args.activity_days * 86400 // args.github_interval // 100),
+        },
+        "scenarios": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--requests", type=int, default=1000, help="Requests per top100 scenario")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--seed", action="store_true", help="Truncate and seed top100 with synthetic rows")
+    parser.add_argument("--github-port", type=int, default=9000)
+    parser.add_argument("--github-latency-ms", type=float, default=50)
+    parser.add_argument("--github-interval", type=int, default=600, help="Seconds between fake commits")
+    parser.add_argument("--github-authors", type=int, default=50)
+    parser.add_argument("--activity-days", type=int, default=30)
+    parser.add_argument("--activity-repos", type=int, default=50)
+    parser.add_argument("--activity-store", action="store_true", help="Keep the Postgres commit store enabled")
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    report = json.dumps(asyncio.run(run(args)), indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(report)
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+import statistics
+from typing import List
+
+"""
+Перцентили задержек для бенчмарков, в миллисекундах.
+"""
+
+
+def percentiles(samples: List[float]) -> dict:
+    if not samples:
+        return {"p50_ms": None, "p90_ms": None, "p99_ms": None, "mean_ms": None, "max_ms": None}
+    ordered = sorted(samples)
+
+    def at(fraction: float) -> float:
+        return round(ordered[min(int(len(ordered) * fraction), len(ordered) - 1)] * 1000, 3)
+
+    return {
+        "p50_ms": round(statistics.median(ordered) * 1000, 3),
+        "p90_ms": at(0.9),
+        "p99_ms": at(0.99),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
@@ -0,0 +1,46 @@
+from typing import Optional
+
+import aiohttp
+from core.settings import settings
+
+"""
+Общая сессия aiohttp на воркер. Создаётся и закрывается в lifespan,
+поэтому TCP/TLS соединения с гитхабом, кэш DNS и keep-alive
+переиспользуются между запросами, а не создаются заново на каждый.
+Лимиты коннектора и таймауты берутся из настроек.
+"""
+
+
+class HttpClient:
+    def __init__(self):
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def start(self):
+        connector = aiohttp.TCPConnector(
+            limit=settings.gh_pool_limit,
+            limit_per_host=settings.gh_limit_per_host,
+            keepalive_timeout=settings.gh_keepalive_timeout,
+            ttl_dns_cache=settings.gh_dns_cache_ttl,
+        )
+        timeout = aiohttp.ClientTimeout(
+            total=settings.gh_timeout_total,
+            connect=settings.gh_timeout_connect,
+            sock_read=settings.gh_timeout_read,
+        )
+        self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    @property
+    def session(self) -> Optional[aiohttp.ClientSession]:
+        return self._session
+
+
+http_client = HttpClient()
+
+
+def get_http_session() -> Optional[aiohttp.ClientSession]:
+    return http_client.session
@@ -0,0 +1,108 @@
+import os
+import time
+
+from fastapi import Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client.multiprocess import MultiProcessCollector, mark_process_dead
+
+"""
+Метрики для прометеуса.
+
+Задержка по маршрутам пишется в MetricsMiddleware, в лейбл идёт шаблон пути
+(/api/repos/{owner}/{repo}/activity), а не сам путь, чтобы не плодить серии.
+Это обычный ASGI middleware: он только оборачивает send, без отдельной
+задачи и потока на ответ, как у BaseHTTPMiddleware.
+Ожидание соединения из пула и запросы к гитхабу меряются там, где происходят.
+Число занятых соединений выставляется пулом при выдаче и возврате
+соединения, остаток лимита токенов пулом токенов при каждом ответе
+гитхаба. set_function не подходит: в режиме нескольких процессов он
+ничего не пишет.
+
+Если задан PROMETHEUS_MULTIPROC_DIR (несколько воркеров uvicorn),
+/metrics собирает метрики со всех процессов. В Dockerfile он задан,
+а каталог очищается при старте контейнера. При остановке воркер
+помечается завершённым, чтобы live* гаужи не учитывали его значения.
+"""
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route",
+    ["method", "route", "status"],
+)
+DB_POOL_WAIT_SECONDS = Histogram(
+    "db_pool_acquire_wait_seconds",
+    "Time spent waiting for a connection from the Postgres pool",
+)
+DB_POOL_CONNECTIONS = Gauge(
+    "db_pool_connections",
+    "Postgres pool connections by state",
+    ["state"],
+    multiprocess_mode="livesum",
+)
+GITHUB_REQUESTS = Counter(
+    "github_requests_total",
+    "Requests sent to the GitHub API by response status",
+    ["status"],
+)
+GITHUB_REQUEST_SECONDS = Histogram(
+    "github_request_duration_seconds",
+    "GitHub API request latency",
+)
+ACTIVITY_PREWARMED = Counter(
+    "activity_prewarmed_total",
+    "Activity windows precomputed in the background by outcome",
+    ["outcome"],
+)
+GITHUB_RATE_LIMIT_REMAINING = Gauge(
+    "github_rate_limit_remaining",
+    "Remaining GitHub rate limit budget by token index",
+    ["token"],
+    multiprocess_mode="livemostrecent",
+)
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.labels(
+                scope["method"], route.path if route else "unmatched", str(status)
+            ).observe(time.perf_counter() - started)
+
+
+def metrics_response() -> Response:
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        MultiProcessCollector(registry)
+        return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+def mark_worker_stopped():
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        mark_process_dead(os.getpid())
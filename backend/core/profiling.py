@@ -0,0 +1,162 @@
+import asyncio
+import hmac
+import logging
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Dict, Optional
+from uuid import uuid4
+
+import orjson
+from core.settings import settings
+
+"""
+Профилирование отдельных запросов по требованию.
+
+Включается, только если заданы PROFILE_DIR и PROFILE_TOKEN, и только для
+запросов с заголовком X-Profile-Token, равным PROFILE_TOKEN.
+ProfilingMiddleware это обычный ASGI middleware: запрос без заголовка
+сразу уходит в приложение, без лишней задачи и потока на ответ.
+
+Для такого запроса в PROFILE_DIR пишутся два файла с общим id
+(он же возвращается в заголовке X-Profile-Id):
+
+- <id>.json: маршрут, статус, общее время и время по этапам;
+- <id>.html: сэмплирующий профиль pyinstrument с интервалом
+  PROFILE_INTERVAL.
+
+Этапы отмечаются через phase(name) или record_phase(name, seconds)
+там, где они происходят:
+db_pool (ожидание соединения), db_query (соединение занято запросом),
+github (запрос к апи гитхаба), encode (валидация и сериализация top100).
+Время этапа суммируется по всем его вызовам, поэтому параллельные запросы
+к гитхабу могут дать в сумме больше общего времени. other это всё,
+что не попало в этапы: роутинг, зависимости, валидация response_model
+и отправка ответа. Вне профилируемого запроса phase ничего не делает.
+
+Запрос профилируется до отправки последнего байта тела, поэтому
+потоковые ответы (NDJSON) попадают в профиль целиком.
+"""
+
+PROFILE_HEADER = b"x-profile-token"
+
+_phases: ContextVar[Optional[Dict[str, Dict]]] = ContextVar("profile_phases", default=None)
+
+
+def record_phase(name: str, seconds: float):
+    phases = _phases.get()
+    if phases is None:
+        return
+    timing = phases.setdefault(name, {"seconds": 0.0, "calls": 0})
+    timing["seconds"] += seconds
+    timing["calls"] += 1
+
+
+@contextmanager
+def phase(name: str):
+    if _phases.get() is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(name, time.perf_counter() - started)
+
+
+def profile_token(scope) -> Optional[str]:
+    for name, value in scope["headers"]:
+        if name == PROFILE_HEADER:
+            return value.decode("latin-1")
+    return None
+
+
+def is_profiled(scope) -> bool:
+    if not (settings.profile_dir and settings.profile_token):
+        return False
+    token = profile_token(scope)
+    return token is not None and hmac.compare_digest(token, settings.profile_token)
+
+
+_sampler_missing_logged = False
+
+
+def start_sampler():
+    global _sampler_missing_logged
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        if not _sampler_missing_logged:
+            logging.warning("pyinstrument is not installed, profiles will contain phases only")
+            _sampler_missing_logged = True
+        return None
+    profiler = Profiler(interval=settings.profile_interval, async_mode="enabled")
+    profiler.start()
+    return profiler
+
+
+def write_profile(profile_id: str, report: Dict, sampler):
+    os.makedirs(settings.profile_dir, exist_ok=True)
+    path = os.path.join(settings.profile_dir, profile_id)
+    with open(f"{path}.json", "wb") as file:
+        file.write(orjson.dumps(report, option=orjson.OPT_INDENT_2))
+    if sampler is not None:
+        with open(f"{path}.html", "w", encoding="utf-8") as file:
+            file.write(sampler.output_html())
+
+
+class ProfilingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not is_profiled(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S}-{uuid4().hex[:8]}"
+        status = 500
+
+        async def send_with_profile_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message = {
+                    **message,
+                    "headers": [*message.get("headers", []), (b"x-profile-id", profile_id.encode())],
+                }
+            await send(message)
+
+        phases: Dict[str, Dict] = {}
+        reset = _phases.set(phases)
+        sampler = start_sampler()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            total = time.perf_counter() - started
+            _phases.reset(reset)
+            if sampler is not None:
+                sampler.stop()
+            route = scope.get("route")
+            report = {
+                "id": profile_id,
+                "method": scope["method"],
+                "path": scope["path"],
+                "route": route.path if route else "unmatched",
+                "status": status,
+                "total_seconds": round(total, 6),
+                "phases": {
+                    name: {"seconds": round(timing["seconds"], 6), "calls": timing["calls"]}
+                    for name, timing in phases.items()
+                },
+                "other_seconds": round(
+                    max(total - sum(timing["seconds"] for timing in phases.values()), 0.0), 6
+                ),
+            }
+            try:
+                await asyncio.to_thread(write_profile, profile_id, report, sampler)
+            except Exception as e:
+                logging.error(f"Error writing profile {profile_id}: {e}")
@@ -1,3 +1,7 @@
+import os
+import tempfile
+
+from enums.enums import GitHubUrls
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 """
@@ -15,8 +19,46 @@ class Settings(BaseSettings):
     db_port: int
     db_user: str
     db_pass: str
+    db_pool_min_size: int = 1
+    db_pool_max_size: int = 10
+    db_acquire_timeout: float = 5.0
+    db_statement_timeout_ms: int = 5000
+
+    top100_channel: str = "top100_updated"
+    top100_cache_ttl: float = 600.0
 
     gh_auth_token: str
+    gh_rate_limit_max_wait: float = 30.0
+    gh_rate_limit_pace_below: int = 100
+    gh_base_url: str = GitHubUrls.BASE_URL.value
+    gh_concurrency: int = 8
+    gh_pool_limit: int = 100
+    gh_limit_per_host: int = 32
+    gh_keepalive_timeout: float = 30.0
+    gh_dns_cache_ttl: int = 300
+    gh_timeout_total: float = 60.0
+    gh_timeout_connect: float = 5.0
+    gh_timeout_read: float = 30.0
+    gh_cache_path: str = os.path.join(tempfile.gettempdir(), "github_responses.sqlite")
+    gh_cache_max_bytes: int = 256 * 1024 * 1024
+
+    activity_store_enabled: bool = True
+    activity_settle_days: int = 7
+    activity_cache_size: int = 1024
+    activity_cache_ttl: float = 60.0
+    activity_batch_concurrency: int = 4
+    activity_batch_max_repos: int = 100
+
+    prewarm_enabled: bool = True
+    prewarm_channel: str = "activity_prewarmed"
+    prewarm_windows: str = "7,30,90"
+    prewarm_interval: float = 900.0
+    prewarm_cache_ttl: float = 1800.0
+    prewarm_budget_share: float = 0.2
+
+    profile_dir: str = ""
+    profile_token: str = ""
+    profile_interval: float = 0.001
 
 
 settings = Settings()
@@ -1,15 +1,28 @@
 from abc import ABC, abstractmethod
-from typing import Dict, List, Optional
+from datetime import date, datetime
+from typing import AsyncContextManager, Callable, Dict, List, NamedTuple, Optional, Set, Tuple
 
-from psycopg2.extensions import connection
+from asyncpg import Connection
 
 """
 Абстрактные классы для более гибкой работы с базами.
 
-AbstractDatabase нужен для подключения к базе.
+AbstractDatabase нужен для подключения к базе. Пул асинхронный,
+открывается и закрывается в lifespan приложения. listen подписывает
+callback на уведомления канала (в постгрес это LISTEN/NOTIFY), notify
+их отправляет. try_advisory_lock берёт блокировку на всё время работы
+процесса, чтобы из нескольких воркеров что-то делал только один.
 
 AbstractRepoStorage нужен для реализации работы c таблицей,
-где хранятся именно репозитории.
+где хранятся именно репозитории. query_top100 делает выборку из топа
+с фильтрами, нужными колонками и постраничной выдачей (Top100Query).
+
+AbstractActivityStorage хранит уже скачанные коммиты по дням
+и помнит, какие дни по репозиторию скачаны полностью.
+get_top_authors отдаёт самых активных авторов за период с числом коммитов.
+
+AbstractHistoryStorage отдаёт историю звёзд/места репозитория,
+которую парсер дописывает каждый прогон, прореженную до нужного шага.
 
 Эти два класса гарантируют, что в случае изменения и/или добавления
 нового хранилища, в других частях кода оно будет подключаться и работать,
@@ -17,9 +30,40 @@ AbstractRepoStorage нужен для реализации работы c таб
 """
 
 
+class Top100Query(NamedTuple):
+    language: Optional[str] = None
+    min_stars: Optional[int] = None
+    max_stars: Optional[int] = None
+    fields: Optional[Tuple[str, ...]] = None
+    sort_by: str = "position_cur"
+    sort_order: str = "asc"
+    limit: int = 100
+    after: Optional[Tuple] = None
+
+
 class AbstractDatabase(ABC):
     @abstractmethod
-    def get_connection(self) -> connection:
+    async def connect(self) -> None:
+        pass
+
+    @abstractmethod
+    async def close(self) -> None:
+        pass
+
+    @abstractmethod
+    def get_connection(self) -> AsyncContextManager[Connection]:
+        pass
+
+    @abstractmethod
+    async def listen(self, channel: str, callback: Callable) -> None:
+        pass
+
+    @abstractmethod
+    async def notify(self, channel: str, payload: str = "") -> None:
+        pass
+
+    @abstractmethod
+    async def try_advisory_lock(self, key: int) -> bool:
         pass
 
 
@@ -27,3 +71,39 @@ class AbstractRepoStorage(ABC):
     @abstractmethod
     async def get_top100(self, sort_by: Optional[str] = None, sort_order: str = "asc") -> List[Dict]:
         pass
+
+    @abstractmethod
+    async def query_top100(self, query: Top100Query) -> List[Dict]:
+        pass
+
+
+class AbstractActivityStorage(ABC):
+    @abstractmethod
+    async def create_tables(self) -> None:
+        pass
+
+    @abstractmethod
+    async def get_covered_days(self, repo: str, since: date, until: date) -> Set[date]:
+        pass
+
+    @abstractmethod
+    async def save_commits(self, repo: str, commits: List[Tuple], covered_days: List[date]) -> None:
+        pass
+
+    @abstractmethod
+    async def get_activity(self, repo: str, since: datetime, until: datetime) -> Tuple[int, List[str]]:
+        pass
+
+    @abstractmethod
+    async def get_top_authors(
+        self, repo: str, since: datetime, until: datetime, limit: int
+    ) -> List[Dict]:
+        pass
+
+
+class AbstractHistoryStorage(ABC):
+    @abstractmethod
+    async def get_history(
+        self, repo: str, since: datetime, until: datetime, bucket_seconds: int
+    ) -> List[Dict]:
+        pass
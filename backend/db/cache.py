@@ -0,0 +1,100 @@
+import asyncio
+import hashlib
+import logging
+import time
+from operator import itemgetter
+from typing import Dict, List, Optional
+
+import orjson
+from core.settings import settings
+from db.abc_db import AbstractRepoStorage, Top100Query
+from db.postgres import TOP100_FIELDS, PostgresRepoStorage, postgres_instance
+
+"""
+Кэш топ100 в памяти процесса.
+
+Данные в top100 меняются только после прогона парсера (раз в ~3 часа),
+поэтому нет смысла ходить в базу на каждый запрос. Top100Snapshot держит
+текущий снимок и перечитывает его, когда парсер присылает NOTIFY в конце
+Loader.process_data. На случай, если уведомление потерялось (например,
+отвалилось LISTEN соединение), снимок всё равно устаревает через TTL.
+
+CachedRepoStorage реализует тот же AbstractRepoStorage, поэтому RepoService
+не знает, что данные берутся из памяти. Сортировка по любому полю
+делается над снимком, без запроса в базу. Выборки с фильтрами
+и пагинацией (query_top100) идут в хранилище снимка, т.е. в базу:
+их вариантов слишком много, чтобы держать в памяти.
+
+version это хэш содержимого снимка. Он одинаков во всех воркерах
+и меняется только когда парсер реально что-то поменял, поэтому
+годится для ETag.
+"""
+
+
+class Top100Snapshot:
+    def __init__(self, storage: AbstractRepoStorage, ttl: float):
+        self.storage = storage
+        self._ttl = ttl
+        self._rows: Optional[List[Dict]] = None
+        self._loaded_at = 0.0
+        self.version: Optional[str] = None
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    def _is_fresh(self) -> bool:
+        return self._rows is not None and time.monotonic() - self._loaded_at < self._ttl
+
+    async def get(self) -> List[Dict]:
+        if not self._is_fresh():
+            async with self._lock:
+                if not self._is_fresh():
+                    await self._load()
+        return self._rows
+
+    async def refresh(self):
+        async with self._lock:
+            await self._load()
+
+    async def _load(self):
+        rows = await self.storage.get_top100()
+        self.version = hashlib.blake2b(orjson.dumps(rows), digest_size=12).hexdigest()
+        self._rows = rows
+        self._loaded_at = time.monotonic()
+
+    def on_notify(self, *_):
+        # Старый снимок продолжает отдаваться, пока новый не загрузится
+        self._refresh_task = asyncio.create_task(self._refresh_logged())
+
+    async def _refresh_logged(self):
+        try:
+            await self.refresh()
+        except Exception as e:
+            logging.error(f"Error refreshing top100 snapshot: {e}")
+            self._loaded_at = 0.0
+
+
+class CachedRepoStorage(AbstractRepoStorage):
+    def __init__(self, snapshot: Top100Snapshot):
+        self._snapshot = snapshot
+
+    async def get_top100(self, sort_by: Optional[str] = None, sort_order: str = "asc") -> List[Dict]:
+        repositories = await self._snapshot.get()
+        if sort_by and sort_by in TOP100_FIELDS:
+            return sorted(
+                repositories,
+                key=itemgetter(sort_by),
+                reverse=sort_order.lower() != "asc",
+            )
+        return list(repositories)
+
+    async def query_top100(self, query: Top100Query) -> List[Dict]:
+        return await self._snapshot.storage.query_top100(query)
+
+
+top100_snapshot = Top100Snapshot(
+    PostgresRepoStorage(postgres_instance), ttl=settings.top100_cache_ttl
+)
+
+
+def get_top100_snapshot() -> Top100Snapshot:
+    return top100_snapshot
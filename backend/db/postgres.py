@@ -1,68 +1,169 @@
 import logging
-from typing import Dict, List, Optional
+import time
+from contextlib import asynccontextmanager
+from datetime import date, datetime
+from typing import Callable, Dict, List, Optional, Set, Tuple
 
+import asyncpg
+from core.metrics import DB_POOL_CONNECTIONS, DB_POOL_WAIT_SECONDS
+from core.profiling import phase, record_phase
 from core.settings import settings
-from db.abc_db import AbstractDatabase, AbstractRepoStorage
+from db.abc_db import (
+    AbstractActivityStorage,
+    AbstractDatabase,
+    AbstractHistoryStorage,
+    AbstractRepoStorage,
+    Top100Query,
+)
 from enums.enums import SqlQueries
-from psycopg2 import OperationalError, pool
 
 
 """
-Два класса для работы с бд. Оба наследуются от своих абстрактных классов
+Классы для работы с бд. Все наследуются от своих абстрактных классов
 
-PostgresDatabase выполняет подключение к постгрес
+PostgresDatabase держит асинхронный пул asyncpg, поэтому запросы
+не блокируют event loop. Пул открывается и закрывается в lifespan.
+Размер пула, таймаут ожидания свободного соединения и statement_timeout
+берутся из настроек. Для LISTEN используется отдельное соединение вне пула,
+т.к. подписка живёт всё время работы приложения. Так же отдельным
+соединением держится advisory lock (try_advisory_lock): он привязан
+к сессии и отпускается, только когда соединение закрывается.
 
 PostgresRepoStorage работает с таблицей, где лежат репозитории,
 делает выборку топ100 репозиториев и возвращает их.
+query_top100 собирает запрос из Top100Query: в SELECT попадают только
+запрошенные колонки (плюс ключ сортировки и repo для курсора), фильтры
+по языку и звёздам идут в WHERE, а следующая страница выбирается по
+ключу (sort_by, repo) > последней строки, без OFFSET. Имена колонок берутся
+только из TOP100_FIELDS, значения передаются параметрами.
+Индексы под эти запросы создаёт парсер в prepare_storage.
+
+PostgresActivityStorage хранит метаданные коммитов в таблице activity
+(по репозиторию и дню) и отметки о полностью скачанных днях в activity_coverage.
+Коммиты и авторы за период считаются уже по базе, самые активные
+авторы тоже (GROUP BY с LIMIT).
+
+PostgresHistoryStorage читает top100_history. Точки группируются в бакеты
+по bucket_seconds, из каждого бакета берётся последнее значение.
+Таблица партиционирована по месяцам и имеет BRIN индекс по времени,
+поэтому выборка за период не читает всю историю.
 
 """
 
+TOP100_SIZE = 100
+
+TOP100_FIELDS = (
+    "repo", "owner", "position_cur", "position_prev",
+    "stars", "watchers", "forks", "open_issues", "language"
+)
+
 
 class PostgresDatabase(AbstractDatabase):
     def __init__(self):
-        self._db_pool = pool.SimpleConnectionPool(
-            minconn=1,
-            maxconn=10,
+        self._db_pool: Optional[asyncpg.Pool] = None
+        self._listener: Optional[asyncpg.Connection] = None
+        self._lock_connection: Optional[asyncpg.Connection] = None
+        self._held_locks: Set[int] = set()
+
+    async def connect(self):
+        self._db_pool = await asyncpg.create_pool(
+            min_size=settings.db_pool_min_size,
+            max_size=settings.db_pool_max_size,
+            user=settings.db_user,
+            password=settings.db_pass,
+            host=settings.db_host,
+            port=settings.db_port,
+            database=settings.db_name,
+            server_settings={"statement_timeout": str(settings.db_statement_timeout_ms)},
+        )
+        self.report_pool_stats()
+
+    async def close(self):
+        if self._listener is not None:
+            await self._listener.close()
+            self._listener = None
+        if self._lock_connection is not None:
+            await self._lock_connection.close()
+            self._lock_connection = None
+            self._held_locks = set()
+        if self._db_pool is not None:
+            await self._db_pool.close()
+            self._db_pool = None
+        self.report_pool_stats()
+
+    @asynccontextmanager
+    async def get_connection(self):
+        started = time.perf_counter()
+        try:
+            async with self._db_pool.acquire(timeout=settings.db_acquire_timeout) as connection:
+                waited = time.perf_counter() - started
+                DB_POOL_WAIT_SECONDS.observe(waited)
+                record_phase("db_pool", waited)
+                self.report_pool_stats()
+                with phase("db_query"):
+                    yield connection
+        finally:
+            self.report_pool_stats()
+
+    def pool_stats(self) -> Dict[str, int]:
+        if self._db_pool is None:
+            return {"in_use": 0, "idle": 0}
+        idle = self._db_pool.get_idle_size()
+        return {"in_use": self._db_pool.get_size() - idle, "idle": idle}
+
+    def report_pool_stats(self):
+        for state, count in self.pool_stats().items():
+            DB_POOL_CONNECTIONS.labels(state).set(count)
+
+    @staticmethod
+    async def connect_single() -> asyncpg.Connection:
+        return await asyncpg.connect(
             user=settings.db_user,
             password=settings.db_pass,
             host=settings.db_host,
             port=settings.db_port,
-            database=settings.db_name
+            database=settings.db_name,
         )
 
-    def get_connection(self):
-        return self._db_pool.getconn()
+    async def listen(self, channel: str, callback: Callable):
+        if self._listener is None:
+            self._listener = await self.connect_single()
+            self._listener.add_termination_listener(
+                lambda _: logging.error("LISTEN connection lost, relying on cache TTL")
+            )
+        await self._listener.add_listener(channel, callback)
 
-    def put_connection(self, conn):
-        self._db_pool.putconn(conn)
+    async def notify(self, channel: str, payload: str = ""):
+        async with self.get_connection() as connection:
+            await connection.execute(SqlQueries.NOTIFY.value, channel, payload)
 
-    def close_all_connections(self):
-        self._db_pool.closeall()
+    async def try_advisory_lock(self, key: int) -> bool:
+        if self._lock_connection is None or self._lock_connection.is_closed():
+            # Блокировка живёт, пока живёт сессия: с новым соединением её надо взять заново
+            self._lock_connection = await self.connect_single()
+            self._held_locks = set()
+        if key not in self._held_locks and await self._lock_connection.fetchval(
+            SqlQueries.TRY_ADVISORY_LOCK.value, key
+        ):
+            self._held_locks.add(key)
+        return key in self._held_locks
 
 
 class PostgresRepoStorage(AbstractRepoStorage):
-    def __init__(self, db: PostgresDatabase):
+    def __init__(self, db: AbstractDatabase):
         self._db = db
         self.sql_queries = SqlQueries
 
     async def get_top100(self, sort_by: Optional[str] = None, sort_order: str = "asc") -> List[Dict]:
-        connection = self._db.get_connection()
         try:
-            cursor = connection.cursor()
             query = self.sql_queries.GET_TOP100.value
 
-            valid_fields = [
-                "repo", "owner", "position_cur", "position_prev",
-                "stars", "watchers", "forks", "open_issues", "language"
-            ]
-
-            if sort_by and sort_by in valid_fields:
+            if sort_by and sort_by in TOP100_FIELDS:
                 order = "ASC" if sort_order.lower() == "asc" else "DESC"
                 query = f"SELECT * FROM ({query.strip().rstrip(';')}) AS top_repos ORDER BY {sort_by} {order}"
 
-            cursor.execute(query)
-            repositories = cursor.fetchall()
-            cursor.close()
+            async with self._db.get_connection() as connection:
+                repositories = await connection.fetch(query)
 
             return [
                 {
@@ -81,8 +182,117 @@ class PostgresRepoStorage(AbstractRepoStorage):
         except Exception as e:
             logging.error(f"Error in get_top100: {e}")
             raise
-        finally:
-            self._db.put_connection(connection)
+
+    async def query_top100(self, query: Top100Query) -> List[Dict]:
+        try:
+            columns = list(dict.fromkeys((*(query.fields or TOP100_FIELDS), query.sort_by, "repo")))
+            # NULL ломает сравнение кортежей, поэтому язык сортируется так же, как отдаётся
+            sort_key = (
+                "coalesce(language, 'Unknown')" if query.sort_by == "language" else query.sort_by
+            )
+            direction = "ASC" if query.sort_order == "asc" else "DESC"
+            params = []
+
+            def param(value) -> str:
+                params.append(value)
+                return f"${len(params)}"
+
+            conditions = [f"position_cur BETWEEN 1 AND {param(TOP100_SIZE)}"]
+            if query.language is not None:
+                if query.language.lower() == "unknown":
+                    conditions.append("language IS NULL")
+                else:
+                    conditions.append(f"lower(language) = lower({param(query.language)})")
+            if query.min_stars is not None:
+                conditions.append(f"stars >= {param(query.min_stars)}")
+            if query.max_stars is not None:
+                conditions.append(f"stars <= {param(query.max_stars)}")
+            if query.after is not None:
+                value, repo = query.after
+                operator = ">" if direction == "ASC" else "<"
+                conditions.append(f"({sort_key}, repo) {operator} ({param(value)}, {param(repo)})")
+
+            sql = self.sql_queries.QUERY_TOP100.value.format(
+                columns=", ".join(columns),
+                conditions=" AND ".join(conditions),
+                order=f"{sort_key} {direction}, repo {direction}",
+                limit=param(query.limit),
+            )
+
+            async with self._db.get_connection() as connection:
+                repositories = await connection.fetch(sql, *params)
+
+            rows = [dict(repo_data) for repo_data in repositories]
+            if "language" in columns:
+                for row in rows:
+                    row["language"] = row["language"] or "Unknown"
+            return rows
+        except Exception as e:
+            logging.error(f"Error in query_top100: {e}")
+            raise
+
+
+class PostgresActivityStorage(AbstractActivityStorage):
+    def __init__(self, db: AbstractDatabase):
+        self._db = db
+        self.sql_queries = SqlQueries
+
+    async def create_tables(self):
+        async with self._db.get_connection() as connection:
+            await connection.execute(self.sql_queries.CREATE_ACTIVITY_TABLES.value)
+
+    async def get_covered_days(self, repo: str, since: date, until: date) -> Set[date]:
+        async with self._db.get_connection() as connection:
+            rows = await connection.fetch(
+                self.sql_queries.GET_COVERED_DAYS.value, repo, since, until
+            )
+        return {row["day"] for row in rows}
+
+    async def save_commits(self, repo: str, commits: List[Tuple], covered_days: List[date]):
+        async with self._db.get_connection() as connection:
+            async with connection.transaction():
+                if commits:
+                    await connection.executemany(
+                        self.sql_queries.INSERT_COMMITS.value,
+                        [(repo, *commit) for commit in commits],
+                    )
+                if covered_days:
+                    await connection.execute(
+                        self.sql_queries.INSERT_COVERAGE.value, repo, covered_days
+                    )
+
+    async def get_activity(self, repo: str, since: datetime, until: datetime) -> Tuple[int, List[str]]:
+        async with self._db.get_connection() as connection:
+            row = await connection.fetchrow(
+                self.sql_queries.GET_ACTIVITY.value,
+                repo, since.date(), until.date(), since, until,
+            )
+        return row["commits"], row["authors"] or []
+
+    async def get_top_authors(
+        self, repo: str, since: datetime, until: datetime, limit: int
+    ) -> List[Dict]:
+        async with self._db.get_connection() as connection:
+            rows = await connection.fetch(
+                self.sql_queries.GET_TOP_AUTHORS.value,
+                repo, since.date(), until.date(), since, until, limit,
+            )
+        return [{"author": row["author"], "commits": row["commits"]} for row in rows]
+
+
+class PostgresHistoryStorage(AbstractHistoryStorage):
+    def __init__(self, db: AbstractDatabase):
+        self._db = db
+        self.sql_queries = SqlQueries
+
+    async def get_history(
+        self, repo: str, since: datetime, until: datetime, bucket_seconds: int
+    ) -> List[Dict]:
+        async with self._db.get_connection() as connection:
+            rows = await connection.fetch(
+                self.sql_queries.GET_HISTORY.value, repo, since, until, bucket_seconds
+            )
+        return [dict(row) for row in rows]
 
 
 postgres_instance = PostgresDatabase()
@@ -11,11 +11,140 @@ class SqlQueries(str, Enum):
 
     GET_TOP100 = """
                     SELECT * FROM top100
-                    ORDER BY stars DESC
+                    WHERE position_cur > 0
+                    ORDER BY position_cur
                     LIMIT 100
                  """
 
+    QUERY_TOP100 = """
+                    SELECT {columns} FROM top100
+                    WHERE {conditions}
+                    ORDER BY {order}
+                    LIMIT {limit}
+                 """
+
+    CREATE_ACTIVITY_TABLES = """
+                    CREATE TABLE IF NOT EXISTS activity (
+                        repo TEXT NOT NULL,
+                        day DATE NOT NULL,
+                        sha TEXT NOT NULL,
+                        author_name TEXT,
+                        author_email TEXT,
+                        committed_at TIMESTAMPTZ NOT NULL,
+                        PRIMARY KEY (repo, day, sha)
+                    );
+                    CREATE TABLE IF NOT EXISTS activity_coverage (
+                        repo TEXT NOT NULL,
+                        day DATE NOT NULL,
+                        PRIMARY KEY (repo, day)
+                    );
+                 """
+
+    GET_COVERED_DAYS = """
+                    SELECT day FROM activity_coverage
+                    WHERE repo = $1 AND day >= $2 AND day < $3
+                 """
+
+    INSERT_COMMITS = """
+                    INSERT INTO activity (repo, day, sha, author_name, author_email, committed_at)
+                    VALUES ($1, $2, $3, $4, $5, $6)
+                    ON CONFLICT DO NOTHING
+                 """
+
+    INSERT_COVERAGE = """
+                    INSERT INTO activity_coverage (repo, day)
+                    SELECT $1, unnest($2::date[])
+                    ON CONFLICT DO NOTHING
+                 """
+
+    GET_ACTIVITY = """
+                    SELECT count(*) AS commits,
+                           array_agg(DISTINCT format('%s <%s>', author_name, author_email)) AS authors
+                    FROM activity
+                    WHERE repo = $1
+                      AND day BETWEEN $2 AND $3
+                      AND committed_at BETWEEN $4 AND $5
+                 """
+
+    GET_TOP_AUTHORS = """
+                    SELECT format('%s <%s>', author_name, author_email) AS author,
+                           count(*) AS commits
+                    FROM activity
+                    WHERE repo = $1
+                      AND day BETWEEN $2 AND $3
+                      AND committed_at BETWEEN $4 AND $5
+                    GROUP BY author_name, author_email
+                    ORDER BY commits DESC, author_name, author_email
+                    LIMIT $6
+                 """
+
+    GET_HISTORY = """
+                    SELECT to_timestamp(
+                               extract(epoch FROM captured_at)::bigint / $4::bigint * $4::bigint
+                           ) AS captured_at,
+                           (array_agg(stars ORDER BY captured_at DESC))[1] AS stars,
+                           (array_agg(forks ORDER BY captured_at DESC))[1] AS forks,
+                           (array_agg(open_issues ORDER BY captured_at DESC))[1] AS open_issues,
+                           (array_agg(position ORDER BY captured_at DESC))[1] AS position
+                    FROM top100_history
+                    WHERE repo = $1 AND captured_at >= $2 AND captured_at < $3
+                    GROUP BY 1
+                    ORDER BY 1
+                 """
+
+    TRY_ADVISORY_LOCK = "SELECT pg_try_advisory_lock($1)"
+
+    NOTIFY = "SELECT pg_notify($1, $2)"
+
 
 class GitHubUrls(str, Enum):
 
     BASE_URL = "https://api.github.com/repos/"
+
+
+class ResponseCacheQueries(str, Enum):
+
+    JOURNAL_MODE = """
+                    PRAGMA journal_mode=WAL
+                 """
+
+    CREATE_TABLE = """
+                    CREATE TABLE IF NOT EXISTS responses (
+                        url TEXT PRIMARY KEY,
+                        etag TEXT,
+                        last_modified TEXT,
+                        link TEXT,
+                        body BLOB NOT NULL,
+                        size INTEGER NOT NULL,
+                        used_at REAL NOT NULL
+                    )
+                 """
+
+    CREATE_INDEX = """
+                    CREATE INDEX IF NOT EXISTS responses_used_at_idx ON responses (used_at)
+                 """
+
+    SELECT = """
+                    SELECT etag, last_modified, link, body FROM responses WHERE url = ?
+                 """
+
+    TOUCH = """
+                    UPDATE responses SET used_at = ? WHERE url = ?
+                 """
+
+    UPSERT = """
+                    INSERT OR REPLACE INTO responses (url, etag, last_modified, link, body, size, used_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                 """
+
+    TOTAL_SIZE = """
+                    SELECT coalesce(sum(size), 0) FROM responses
+                 """
+
+    BY_LAST_USE = """
+                    SELECT url, size FROM responses ORDER BY used_at
+                 """
+
+    DELETE = """
+                    DELETE FROM responses WHERE url = ?
+                 """
@@ -18,6 +18,10 @@ class RepoServiceExceptions:
         ):
             super().__init__(status_code=500, detail=detail)
 
+    class InvalidQueryException(RepoServiceException):
+        def __init__(self, detail: str = "Invalid query parameters"):
+            super().__init__(status_code=400, detail=detail)
+
     class RateLimitExceededException(RepoServiceException):
         def __init__(self):
             super().__init__(
@@ -1,25 +1,52 @@
 from contextlib import asynccontextmanager
 
 from api.v1 import repos
+from core.http_client import http_client
+from core.metrics import MetricsMiddleware, mark_worker_stopped, metrics_response
+from core.profiling import ProfilingMiddleware
 from core.settings import settings
-from db.postgres import postgres_instance
+from db.cache import top100_snapshot
+from db.postgres import PostgresActivityStorage, postgres_instance
 from fastapi import FastAPI
 from fastapi.responses import ORJSONResponse
+from services.prewarmer import activity_prewarmer
+from services.response_cache import response_cache
 
 """
-Точка входа бекенда. Использовал лайфспан для удобного подключения к бд.
+Точка входа бекенда. Использовал лайфспан для удобного подключения к бд
+и подписки на уведомления парсера об обновлении top100. Там же создаётся
+общая http сессия для запросов к гитхабу и запускается фоновый
+прогрев активности для репозиториев топа (см. services/prewarmer.py).
+Кэш ответов гитхаба для условных запросов (ETag) тоже открывается здесь.
 Также разделил приложение на роутеры, чтобы было удобнее ставить 
 базовый адрес, а также тег к каждому роутеру. Полезно, если потребуется
 добавить другие маршруты с другим функционалом.
+
+/metrics отдаёт метрики для прометеуса (см. core/metrics.py).
+Запрос с заголовком X-Profile-Token профилируется (см. core/profiling.py).
 """
 
 
 @asynccontextmanager
 async def lifespan(_: FastAPI):
+    await postgres_instance.connect()
+    await http_client.start()
+    if settings.gh_cache_path:
+        response_cache.open()
+    await postgres_instance.listen(settings.top100_channel, top100_snapshot.on_notify)
+    if settings.activity_store_enabled:
+        await PostgresActivityStorage(postgres_instance).create_tables()
+    if settings.prewarm_enabled:
+        await postgres_instance.listen(settings.prewarm_channel, activity_prewarmer.on_notify)
+        activity_prewarmer.start()
     try:
         yield
     finally:
-        postgres_instance.close_all_connections()
+        await activity_prewarmer.stop()
+        await http_client.close()
+        response_cache.close()
+        await postgres_instance.close()
+        mark_worker_stopped()
 
 app = FastAPI(
     title=settings.project_name,
@@ -30,6 +57,14 @@ app = FastAPI(
 )
 
 app.include_router(repos.router, prefix="/api/repos", tags=["repos"])
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(ProfilingMiddleware)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return metrics_response()
+
 
 if __name__ == "__main__":
     import uvicorn
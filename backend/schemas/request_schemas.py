@@ -0,0 +1,20 @@
+from typing import List
+
+from core.settings import settings
+from pydantic import BaseModel, Field
+
+"""
+Схемы тел запросов. Валидируют входные данные до того,
+как они попадут в сервис.
+"""
+
+
+class ActivityBatchRequest(BaseModel):
+    repos: List[str] = Field(
+        ...,
+        min_length=1,
+        max_length=settings.activity_batch_max_repos,
+        description="Repositories in owner/repo format",
+    )
+    since: str = Field(..., description="Start date in YYYY-MM-DD format")
+    until: str = Field(..., description="End date in YYYY-MM-DD format")
@@ -1,5 +1,5 @@
-from datetime import date
-from typing import List
+from datetime import date, datetime
+from typing import List, Optional
 
 from pydantic import BaseModel
 
@@ -26,7 +26,41 @@ class DateRange(BaseModel):
     until: date
 
 
+class AuthorCommits(BaseModel):
+    author: str
+    commits: int
+
+
 class RepoActivityResponse(BaseModel):
     date: DateRange
     commits: int
     authors: List[str]
+    top_authors: Optional[List[AuthorCommits]] = None
+
+
+class ActivityError(BaseModel):
+    status_code: int
+    detail: str
+
+
+class ActivityBatchItem(BaseModel):
+    repo: str
+    activity: Optional[RepoActivityResponse] = None
+    error: Optional[ActivityError] = None
+
+
+class ActivityBatchResponse(BaseModel):
+    results: List[ActivityBatchItem]
+
+
+class HistoryPoint(BaseModel):
+    captured_at: datetime
+    stars: int
+    forks: int
+    open_issues: int
+    position: int
+
+
+class RepoHistoryResponse(BaseModel):
+    repo: str
+    points: List[HistoryPoint]
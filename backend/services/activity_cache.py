@@ -0,0 +1,71 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from core.settings import settings
+
+"""
+Склейка одинаковых запросов активности и короткий кэш результатов.
+
+Когда репозиторий в тренде, много клиентов почти одновременно спрашивают
+одну и ту же активность. Первый запрос с данным ключом запускает задачу,
+остальные ждут её же результат, а не запускают свой обход гитхаба.
+Задача обёрнута в shield, поэтому отвалившийся клиент не отменяет её для остальных.
+
+Готовый результат кладётся в LRU кэш с ограниченным размером и TTL.
+Ошибки не кэшируются.
+"""
+
+
+class ActivityCache:
+    def __init__(self, max_size: int, ttl: float):
+        self._max_size = max_size
+        self._ttl = ttl
+        self._results: "OrderedDict[Hashable, Tuple[float, Dict]]" = OrderedDict()
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+
+    def get(self, key: Hashable) -> Optional[Dict]:
+        entry = self._results.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._results[key]
+            return None
+        self._results.move_to_end(key)
+        return value
+
+    def put(self, key: Hashable, value: Dict, ttl: Optional[float] = None):
+        self._results[key] = (time.monotonic() + (ttl or self._ttl), value)
+        self._results.move_to_end(key)
+        while len(self._results) > self._max_size:
+            self._results.popitem(last=False)
+
+    async def get_or_compute(
+        self, key: Hashable, compute: Callable[[], Awaitable[Dict]]
+    ) -> Dict:
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.create_task(compute())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Task):
+        self._in_flight.pop(key, None)
+        if not task.cancelled() and task.exception() is None:
+            self.put(key, task.result())
+
+
+activity_cache = ActivityCache(
+    max_size=settings.activity_cache_size, ttl=settings.activity_cache_ttl
+)
+
+
+def get_activity_cache() -> ActivityCache:
+    return activity_cache
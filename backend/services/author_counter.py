@@ -0,0 +1,54 @@
+import heapq
+from typing import Dict, List
+
+"""
+Подсчёт коммитов по авторам.
+
+Счётчик это словарь "name <email>" -> число коммитов, по одной записи
+на автора. Строка для коммита собирается и сразу выбрасывается, если
+автор уже есть, поэтому память растёт только с числом авторов, а ключи
+счётчика сразу идут в ответ (authors) без копирования. Раньше на каждую
+страницу строилось своё множество строк и объединялось с общим.
+
+Ключ-кортеж (name, email) или sys.intern чуть экономят время на коммит,
+но держат на автора две строки и кортеж вместо одной строки и на
+истории со многими авторами занимают в 2-3 раза больше памяти
+(см. benchmarks/bench_authors.py).
+
+top(n) выбирает n самых активных авторов через heapq, без сортировки
+всех авторов. При равном числе коммитов порядок по имени.
+"""
+
+
+class AuthorCounter:
+    __slots__ = ("commits", "_counts")
+
+    def __init__(self):
+        self.commits = 0
+        self._counts: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def add_page(self, response_json: list) -> List[str]:
+        counts = self._counts
+        get = counts.get
+        new_authors = []
+        for commit_info in response_json:
+            author = commit_info["commit"]["author"]
+            key = f"{author['name']} <{author['email']}>"
+            count = get(key)
+            if count is None:
+                new_authors.append(key)
+                counts[key] = 1
+            else:
+                counts[key] = count + 1
+        self.commits += len(response_json)
+        return new_authors
+
+    def authors(self) -> List[str]:
+        return list(self._counts)
+
+    def top(self, n: int) -> List[Dict]:
+        top_authors = heapq.nsmallest(n, self._counts.items(), key=lambda item: (-item[1], item[0]))
+        return [{"author": author, "commits": commits} for author, commits in top_authors]
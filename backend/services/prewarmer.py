@@ -0,0 +1,196 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Callable, List, Optional
+
+from core.http_client import http_client
+from core.metrics import ACTIVITY_PREWARMED
+from core.settings import settings
+from db.abc_db import AbstractDatabase
+from db.cache import Top100Snapshot, top100_snapshot
+from db.postgres import postgres_instance
+from exceptions.repo_service_exceptions import RepoServiceExceptions
+from services.activity_cache import ActivityCache, activity_cache
+from services.repo_service import (
+    RepoService,
+    get_activity_batch_semaphore,
+    get_repo_service,
+)
+from services.response_cache import get_response_cache
+from services.token_pool import TokenPool, get_token_pool
+from services.top100_encoder import top100_encoder
+
+"""
+Фоновый прогрев активности для текущего топа.
+
+Активность почти всегда спрашивают по репозиториям из top100 и за
+одни и те же окна (последние 7/30/90 дней). Прогрев запускается в lifespan
+и раз в prewarm_interval пересчитывает эти окна для каждого репозитория
+топа, а результат кладёт в ActivityCache с prewarm_cache_ttl (он больше
+интервала, поэтому между прогонами записи не протухают). Запрос
+/activity с since = сегодня минус N дней и until = сегодня (UTC,
+YYYY-MM-DD) отдаётся из кэша.
+
+Окна считаются от длинного к короткому: если включено хранилище
+активности, после 90 дней короткие окна считаются уже по базе.
+
+Прогрев тратит не больше prewarm_budget_share лимита гитхаба: как только
+доля оставшегося лимита по всем токенам опускается ниже 1 - share,
+прогон останавливается до следующего интервала. Остаток берётся из
+заголовков гитхаба, поэтому учитываются и запросы пользователей.
+Без токенов прогрев не запускается.
+
+В гитхаб ходит только один воркер: тот, кто взял advisory lock
+(PREWARM_LOCK_KEY). Остальные раз в интервал пробуют его взять (лок
+освобождается, если воркер-лидер умер). Закончив прогон, лидер шлёт
+NOTIFY в prewarm_channel, и остальные воркеры заполняют свой кэш из
+хранилища активности, куда лидер только что сложил коммиты, без
+запросов к гитхабу. Без хранилища активности заполнять нечем,
+и прогретым оказывается только кэш лидера.
+"""
+
+PREWARM_LOCK_KEY = 0x70726577
+
+
+class ActivityPrewarmer:
+    def __init__(
+        self,
+        snapshot: Top100Snapshot,
+        cache: ActivityCache,
+        db: AbstractDatabase,
+        service_factory: Callable[[], RepoService],
+        token_pool: Optional[TokenPool],
+        windows: List[int],
+        interval: float,
+        ttl: float,
+        budget_share: float,
+    ):
+        self._snapshot = snapshot
+        self._cache = cache
+        self._db = db
+        self._service_factory = service_factory
+        self._token_pool = token_pool
+        self._windows = sorted(windows, reverse=True)
+        self._interval = interval
+        self._ttl = ttl
+        self._budget_share = budget_share
+        self._task: Optional[asyncio.Task] = None
+        self._fill_task: Optional[asyncio.Task] = None
+        self._leader = False
+
+    def start(self):
+        if self._token_pool is None or not self._windows:
+            logging.info("Activity prewarming is disabled: no GitHub tokens or windows")
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        for task in (self._task, self._fill_task):
+            if task is None:
+                continue
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        self._fill_task = None
+
+    def on_notify(self, *_):
+        if self._task is None or self._leader:
+            return
+        if self._fill_task is None or self._fill_task.done():
+            self._fill_task = asyncio.create_task(self._fill_logged())
+
+    def has_budget(self) -> bool:
+        return self._token_pool.remaining_share() > 1 - self._budget_share
+
+    async def _run(self):
+        while True:
+            try:
+                self._leader = await self._db.try_advisory_lock(PREWARM_LOCK_KEY)
+                if self._leader:
+                    await self.prewarm()
+                    await self._db.notify(settings.prewarm_channel)
+            except Exception as e:
+                logging.error(f"Error during activity prewarming: {e}")
+            await asyncio.sleep(self._interval)
+
+    async def _fill_logged(self):
+        try:
+            await self.fill_from_store()
+        except Exception as e:
+            logging.error(f"Error filling activity cache from store: {e}")
+
+    def windows(self):
+        until = datetime.now(timezone.utc).date()
+        for days in self._windows:
+            yield (until - timedelta(days=days)).isoformat(), until.isoformat()
+
+    async def prewarm(self):
+        service = self._service_factory()
+        repositories = await self._snapshot.get()
+
+        for repository in repositories:
+            owner, _, repo = repository["repo"].partition("/")
+            for since_str, until_str in self.windows():
+                if not self.has_budget():
+                    ACTIVITY_PREWARMED.labels("skipped_budget").inc()
+                    logging.info("Activity prewarming paused: rate budget share is used up")
+                    return
+
+                try:
+                    activity = await service.compute_repo_info(owner, repo, since_str, until_str)
+                except RepoServiceExceptions.RateLimitExceededException:
+                    ACTIVITY_PREWARMED.labels("rate_limited").inc()
+                    return
+                except RepoServiceExceptions.RepoServiceException as e:
+                    ACTIVITY_PREWARMED.labels("error").inc()
+                    logging.error(f"Error prewarming {repository['repo']} ({since_str}..{until_str}): {e.detail}")
+                    continue
+
+                self._cache.put(
+                    service.activity_key(owner, repo, since_str, until_str), activity, ttl=self._ttl
+                )
+                ACTIVITY_PREWARMED.labels("ok").inc()
+
+    async def fill_from_store(self):
+        service = self._service_factory()
+        if service.activity_storage is None:
+            return
+        repositories = await self._snapshot.get()
+
+        for repository in repositories:
+            owner, _, repo = repository["repo"].partition("/")
+            for since_str, until_str in self.windows():
+                activity = await service.read_stored_activity(owner, repo, since_str, until_str)
+                self._cache.put(
+                    service.activity_key(owner, repo, since_str, until_str), activity, ttl=self._ttl
+                )
+                ACTIVITY_PREWARMED.labels("from_store").inc()
+
+
+def build_prewarm_service() -> RepoService:
+    return get_repo_service(
+        snapshot=top100_snapshot,
+        top100_encoder=top100_encoder,
+        db=postgres_instance,
+        session=http_client.session,
+        activity_cache=activity_cache,
+        token_pool=get_token_pool(),
+        batch_semaphore=get_activity_batch_semaphore(),
+        response_cache=get_response_cache(),
+    )
+
+
+activity_prewarmer = ActivityPrewarmer(
+    top100_snapshot,
+    activity_cache,
+    postgres_instance,
+    build_prewarm_service,
+    get_token_pool(),
+    windows=[int(days) for days in settings.prewarm_windows.split(",") if days.strip()],
+    interval=settings.prewarm_interval,
+    ttl=settings.prewarm_cache_ttl,
+    budget_share=settings.prewarm_budget_share,
+)
@@ -1,13 +1,37 @@
+import asyncio
 import logging
-from typing import Dict, List, Set, Tuple, Optional
+import math
+import time
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timedelta, timezone
+from typing import AsyncIterator, Dict, Iterable, List, Tuple, Optional
+from urllib.parse import urlencode
 
 import aiohttp
+import orjson
+from core.http_client import get_http_session
+from core.metrics import GITHUB_REQUEST_SECONDS, GITHUB_REQUESTS
+from core.profiling import phase
 from core.settings import settings
-from db.abc_db import AbstractDatabase, AbstractRepoStorage
-from db.postgres import PostgresRepoStorage, get_postgres
-from enums.enums import GitHubUrls
+from db.abc_db import (
+    AbstractActivityStorage,
+    AbstractDatabase,
+    AbstractHistoryStorage,
+    AbstractRepoStorage,
+    Top100Query,
+)
+from db.cache import CachedRepoStorage, Top100Snapshot, get_top100_snapshot
+from db.postgres import TOP100_FIELDS, PostgresActivityStorage, PostgresHistoryStorage, get_postgres
 from exceptions.repo_service_exceptions import RepoServiceExceptions
 from fastapi import Depends
+from schemas.response_schemas import RepoActivityResponse
+from services.activity_cache import ActivityCache, get_activity_cache
+from services.author_counter import AuthorCounter
+from services.response_cache import CachedResponse, ResponseCache, get_response_cache
+from services.token_pool import TokenPool, get_token_pool
+from services.top100_encoder import EncodedTop100, Top100Encoder, get_top100_encoder
+from services.top100_query import decode_cursor, encode_cursor, parse_fields
+from yarl import URL
 
 """
 Класс сервиса для работы с репозиториями.
@@ -15,7 +39,12 @@ from fastapi import Depends
 иметь возможность использовать другую базу. 
 Два основных метода это get_top100 и get_repo_info.
 
-get_top100 выбирает данные из бд и возвращает их. 
+get_top100 выбирает данные из хранилища и возвращает их.
+Сейчас это снимок в памяти (CachedRepoStorage), который обновляется по NOTIFY от парсера.
+get_top100_encoded отдаёт тот же список, но уже сериализованный и сжатый (Top100Encoder).
+query_top100 нужен, когда клиенту нужна только часть топа: фильтр по языку
+и звёздам, выбранные колонки и страницы по limit с курсором. Такая выборка
+делается запросом в хранилище и возвращает страницу и курсор на следующую.
 
 get_repo_info отправляет запрос на апи гитхаба, чтобы получить
 историю коммитов по конкретному репозиторию за конкретный период времени.
@@ -23,6 +52,53 @@ get_repo_info отправляет запрос на апи гитхаба, чт
 парсить данные за большой промежуток времени (например, 1 год)
 Остальные методы разделил по их назначению, чтобы не мешать всё в одну корзину.
 
+Если передано хранилище активности, коммиты складываются в базу по дням,
+и при следующем запросе с гитхаба докачиваются только те дни периода,
+которых ещё нет в базе. Последние activity_settle_days дней (UTC) не считаются
+скачанными полностью и перекачиваются каждый раз: коммиты попадают в ветку
+позже даты коммита (мерж PR сохраняет даты коммитов ветки, пуши опаздывают).
+Уже сохранённые коммиты при перекачке не дублируются (ON CONFLICT DO NOTHING).
+
+Страницы коммитов качаются параллельно: после первой страницы из заголовка
+Link берётся номер последней (rel="last"), и остальные страницы запрашиваются
+одновременно, не больше gh_concurrency за раз. Если Link нет или gh_concurrency <= 1,
+страницы идут по очереди, как раньше.
+
+Http сессия общая на воркер и приходит из lifespan через get_repo_service.
+Если сессию не передали (например, сервис создан вне приложения),
+на время запроса открывается временная.
+
+Одинаковые одновременные запросы активности склеиваются в один через
+ActivityCache, а результат какое-то время отдаётся из кэша.
+
+get_repo_history отдаёт историю звёзд и места репозитория в топе,
+прореженную примерно до points точек за период.
+
+stream_repo_info это потоковый вариант get_repo_info в формате NDJSON:
+после каждой страницы отдаётся строка с текущим числом коммитов и новыми
+авторами, последней строкой идёт итог в виде RepoActivityResponse.
+Ошибка посреди потока тоже отдаётся строкой, т.к. статус уже отправлен.
+
+get_repos_info считает активность сразу для списка репозиториев за один
+период. Каждый репозиторий идёт через get_repo_info (кэш и склейка те же),
+а одновременно считается не больше activity_batch_concurrency репозиториев
+на весь воркер: семафор общий для всех батч-запросов. Ошибка одного
+репозитория не роняет батч, а попадает в его результат. После первого
+"rate limit exceeded" оставшиеся репозитории батча сразу получают ту же
+ошибку, а не ждут лимит по очереди.
+
+С top_n в ответ добавляется top_authors: число коммитов у top_n самых
+активных авторов. Авторы считаются через AuthorCounter (один счётчик
+на весь обход вместо множества строк на каждую страницу и выбор top_n
+через heapq), а при включённом хранилище активности группировкой в базе.
+
+Токены берутся из TokenPool: для каждой страницы выбирается токен с самым
+большим остатком лимита, а при ответе "rate limit exceeded" запрос
+повторяется с другим токеном, вместо того чтобы сразу падать.
+
+Если передан ResponseCache, каждая страница запрашивается с ETag
+прошлого ответа, и на 304 берётся сохранённое тело (лимит не тратится).
+
 Добавил несколько кастомных ошибок.
 
 get_repo_service() возвращает экземпляр класса на основе нужного нам хранилища
@@ -34,11 +110,31 @@ class RepoService:
         self,
         storage_handler: AbstractRepoStorage,
         gh_auth_token: str = settings.gh_auth_token,
-        gh_base_url: str = GitHubUrls.BASE_URL.value,
+        gh_base_url: str = settings.gh_base_url,
+        gh_concurrency: int = settings.gh_concurrency,
+        top100_encoder: Optional[Top100Encoder] = None,
+        activity_storage: Optional[AbstractActivityStorage] = None,
+        session: Optional[aiohttp.ClientSession] = None,
+        activity_cache: Optional[ActivityCache] = None,
+        token_pool: Optional[TokenPool] = None,
+        history_storage: Optional[AbstractHistoryStorage] = None,
+        batch_semaphore: Optional[asyncio.Semaphore] = None,
+        response_cache: Optional[ResponseCache] = None,
     ):
         self.storage_handler = storage_handler
+        self.top100_encoder = top100_encoder
+        self.activity_storage = activity_storage
+        self.session = session
+        self.activity_cache = activity_cache
+        self.token_pool = token_pool
+        self.history_storage = history_storage
+        self.response_cache = response_cache
+        self.batch_semaphore = batch_semaphore or asyncio.Semaphore(
+            settings.activity_batch_concurrency
+        )
         self.gh_auth_token = gh_auth_token
         self.gh_base_url = gh_base_url
+        self.gh_concurrency = gh_concurrency
 
     async def get_top100(self, sort_by: Optional[str] = None, sort_order: str = "asc") -> List[Dict]:
         try:
@@ -47,65 +143,449 @@ class RepoService:
             logging.error(f"Error in get_top100: {e}")
             raise RepoServiceExceptions.InternalRepoServiceException()
 
+    async def get_top100_encoded(
+        self, sort_by: Optional[str] = None, sort_order: str = "asc"
+    ) -> EncodedTop100:
+        try:
+            return await self.top100_encoder.get(sort_by=sort_by, sort_order=sort_order)
+        except Exception as e:
+            logging.error(f"Error in get_top100_encoded: {e}")
+            raise RepoServiceExceptions.InternalRepoServiceException()
+
+    async def query_top100(
+        self,
+        language: Optional[str] = None,
+        min_stars: Optional[int] = None,
+        max_stars: Optional[int] = None,
+        fields: Optional[str] = None,
+        sort_by: Optional[str] = None,
+        sort_order: Optional[str] = "asc",
+        limit: int = 100,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[Dict], Optional[str]]:
+        sort_by = sort_by if sort_by in TOP100_FIELDS else "position_cur"
+        sort_order = "asc" if (sort_order or "asc").lower() == "asc" else "desc"
+        requested = parse_fields(fields)
+        after = decode_cursor(cursor, sort_by, sort_order) if cursor else None
+
+        try:
+            rows = await self.storage_handler.query_top100(
+                Top100Query(
+                    language=language,
+                    min_stars=min_stars,
+                    max_stars=max_stars,
+                    fields=requested,
+                    sort_by=sort_by,
+                    sort_order=sort_order,
+                    limit=limit + 1,
+                    after=after,
+                )
+            )
+        except Exception as e:
+            logging.error(f"Error in query_top100: {e}")
+            raise RepoServiceExceptions.InternalRepoServiceException()
+
+        next_cursor = encode_cursor(sort_by, sort_order, rows[limit - 1]) if len(rows) > limit else None
+        rows = rows[:limit]
+        if requested:
+            rows = [{field: row[field] for field in requested} for row in rows]
+        return rows, next_cursor
+
+    async def get_repo_history(
+        self, owner: str, repo: str, since: Optional[str], until: Optional[str], points: int
+    ) -> Dict:
+        try:
+            until_dt = (
+                datetime.combine(date.fromisoformat(until), datetime.min.time(), timezone.utc)
+                if until
+                else datetime.now(timezone.utc)
+            )
+            since_dt = (
+                datetime.combine(date.fromisoformat(since), datetime.min.time(), timezone.utc)
+                if since
+                else until_dt - timedelta(days=30)
+            )
+            bucket_seconds = max(math.ceil((until_dt - since_dt).total_seconds() / points), 1)
+            history = await self.history_storage.get_history(
+                f"{owner}/{repo}".lower(), since_dt, until_dt, bucket_seconds
+            )
+            return {"repo": f"{owner}/{repo}", "points": history}
+        except Exception as e:
+            logging.error(f"Error in get_repo_history: {e}")
+            raise RepoServiceExceptions.InternalRepoServiceException()
+
     async def get_repo_info(
-        self, owner: str, repo: str, since: str, until: str
+        self, owner: str, repo: str, since: str, until: str, top_n: Optional[int] = None
+    ) -> Dict:
+        if self.activity_cache is None:
+            return await self.compute_repo_info(owner, repo, since, until, top_n)
+        return await self.activity_cache.get_or_compute(
+            self.activity_key(owner, repo, since, until, top_n),
+            lambda: self.compute_repo_info(owner, repo, since, until, top_n),
+        )
+
+    @staticmethod
+    def activity_key(
+        owner: str, repo: str, since: str, until: str, top_n: Optional[int] = None
+    ) -> Tuple:
+        return owner.lower(), repo.lower(), since, until, top_n
+
+    async def get_repos_info(self, repos: List[str], since: str, until: str) -> Dict:
+        rate_limited = asyncio.Event()
+
+        async def get_one(full_name: str) -> Dict:
+            owner, _, repo = full_name.partition("/")
+            if not owner or not repo or "/" in repo:
+                error = RepoServiceExceptions.InvalidQueryException(
+                    "Repository must be in owner/repo format"
+                )
+                return {"repo": full_name, "error": {"status_code": error.status_code, "detail": error.detail}}
+
+            async with self.batch_semaphore:
+                if rate_limited.is_set():
+                    error = RepoServiceExceptions.RateLimitExceededException()
+                else:
+                    try:
+                        activity = await self.get_repo_info(owner, repo, since, until)
+                        return {"repo": full_name, "activity": activity}
+                    except RepoServiceExceptions.RateLimitExceededException as e:
+                        rate_limited.set()
+                        error = e
+                    except RepoServiceExceptions.RepoServiceException as e:
+                        error = e
+                    except Exception as e:
+                        logging.error(f"Error in get_repos_info for {full_name}: {e}")
+                        error = RepoServiceExceptions.InternalRepoServiceException()
+            return {"repo": full_name, "error": {"status_code": error.status_code, "detail": error.detail}}
+
+        results = await asyncio.gather(*(get_one(full_name) for full_name in dict.fromkeys(repos)))
+        return {"results": results}
+
+    async def compute_repo_info(
+        self, owner: str, repo: str, since: str, until: str, top_n: Optional[int] = None
     ) -> Dict:
         url = f"{self.gh_base_url}{owner}/{repo}/commits"
         params = {"since": since, "until": until, "per_page": 100}
-        headers = {"Authorization": f"token {self.gh_auth_token}"}
+        headers = {} if self.token_pool is not None else {"Authorization": f"token {self.gh_auth_token}"}
         try:
-            commits, authors = await self.fetch_commits(url, headers, params)
-            return self.build_response(commits, authors, since, until)
+            if self.activity_storage is None:
+                counter = await self.fetch_commits(url, headers, params)
+                commits, authors = counter.commits, counter.authors()
+                top_authors = counter.top(top_n) if top_n else None
+            else:
+                commits, authors, top_authors = await self.fetch_stored_activity(
+                    f"{owner}/{repo}".lower(), url, headers, since, until, top_n
+                )
+            return self.build_response(commits, authors, since, until, top_authors)
         except RepoServiceExceptions.RepoServiceException as e:
             raise e
         except Exception as e:
             logging.error(f"Error in get_repo_info: {e}")
             raise RepoServiceExceptions.InternalRepoServiceException()
 
-    async def fetch_commits(
+    async def read_stored_activity(self, owner: str, repo: str, since: str, until: str) -> Dict:
+        since_dt = datetime.combine(date.fromisoformat(since), datetime.min.time(), timezone.utc)
+        until_dt = datetime.combine(date.fromisoformat(until), datetime.min.time(), timezone.utc)
+        commits, authors = await self.activity_storage.get_activity(
+            f"{owner}/{repo}".lower(), since_dt, until_dt
+        )
+        return self.build_response(commits, authors, since, until)
+
+    async def stream_repo_info(
+        self, owner: str, repo: str, since: str, until: str, top_n: Optional[int] = None
+    ) -> AsyncIterator[bytes]:
+        url = f"{self.gh_base_url}{owner}/{repo}/commits"
+        params = {"since": since, "until": until, "per_page": 100}
+        headers = {} if self.token_pool is not None else {"Authorization": f"token {self.gh_auth_token}"}
+        counter = AuthorCounter()
+        try:
+            async for page in self.fetch_commit_pages(url, headers, params):
+                new_authors = counter.add_page(page)
+                yield self.ndjson_line(
+                    {
+                        "type": "progress",
+                        "commits": counter.commits,
+                        "new_authors": new_authors,
+                    }
+                )
+            activity = RepoActivityResponse(
+                **self.build_response(
+                    counter.commits,
+                    counter.authors(),
+                    since,
+                    until,
+                    counter.top(top_n) if top_n else None,
+                )
+            )
+            yield self.ndjson_line(
+                {"type": "summary", "activity": activity.model_dump(mode="json", exclude_none=True)}
+            )
+        except RepoServiceExceptions.RepoServiceException as e:
+            yield self.ndjson_line({"type": "error", "status_code": e.status_code, "detail": e.detail})
+        except Exception as e:
+            logging.error(f"Error in stream_repo_info: {e}")
+            error = RepoServiceExceptions.InternalRepoServiceException()
+            yield self.ndjson_line({"type": "error", "status_code": error.status_code, "detail": error.detail})
+
+    @staticmethod
+    def ndjson_line(record: Dict) -> bytes:
+        return orjson.dumps(record) + b"\n"
+
+    async def fetch_stored_activity(
+        self,
+        repo_key: str,
+        url: str,
+        headers: dict,
+        since: str,
+        until: str,
+        top_n: Optional[int] = None,
+    ) -> Tuple[int, List[str], Optional[List[Dict]]]:
+        since_day, until_day = date.fromisoformat(since), date.fromisoformat(until)
+        settled_before = datetime.now(timezone.utc).date() - timedelta(days=settings.activity_settle_days)
+
+        covered = {
+            day
+            for day in await self.activity_storage.get_covered_days(repo_key, since_day, until_day)
+            if day < settled_before
+        }
+        missing = [
+            since_day + timedelta(days=offset)
+            for offset in range((until_day - since_day).days)
+            if since_day + timedelta(days=offset) not in covered
+        ]
+
+        for first_day, last_day in self.group_days(missing):
+            params = {
+                "since": f"{first_day.isoformat()}T00:00:00Z",
+                "until": f"{(last_day + timedelta(days=1)).isoformat()}T00:00:00Z",
+                "per_page": 100,
+            }
+            commits = []
+            async for page in self.fetch_commit_pages(url, headers, params):
+                commits.extend(self.extract_commits(page))
+            covered_days = [
+                first_day + timedelta(days=offset)
+                for offset in range((last_day - first_day).days + 1)
+                if first_day + timedelta(days=offset) < settled_before
+            ]
+            await self.activity_storage.save_commits(repo_key, commits, covered_days)
+
+        since_dt = datetime.combine(since_day, datetime.min.time(), timezone.utc)
+        until_dt = datetime.combine(until_day, datetime.min.time(), timezone.utc)
+        commits, authors = await self.activity_storage.get_activity(repo_key, since_dt, until_dt)
+        top_authors = (
+            await self.activity_storage.get_top_authors(repo_key, since_dt, until_dt, top_n)
+            if top_n
+            else None
+        )
+        return commits, authors, top_authors
+
+    async def fetch_commits(self, url: str, headers: dict, params: dict) -> AuthorCounter:
+        counter = AuthorCounter()
+        async for page in self.fetch_commit_pages(url, headers, params):
+            counter.add_page(page)
+        return counter
+
+    async def fetch_commit_pages(
         self, url: str, headers: dict, params: dict
-    ) -> Tuple[int, Set[str]]:
-        commits = 0
-        authors = set()
+    ) -> AsyncIterator[list]:
+        params = dict(params)
+        async with self.open_session() as session:
+            response_json, last_page = await self.fetch_commit_page(session, url, headers, params)
+            yield response_json
+            if len(response_json) < 100:
+                return
+
+            if self.gh_concurrency > 1 and last_page:
+                async for response_json in self.fetch_pages_concurrently(
+                    session, url, headers, params, range(2, last_page + 1)
+                ):
+                    yield response_json
+                return
+
+            while len(response_json) == 100:
+                params["page"] = params.get("page", 1) + 1
+                response_json, _ = await self.fetch_commit_page(session, url, headers, params)
+                yield response_json
+
+    @asynccontextmanager
+    async def open_session(self) -> AsyncIterator[aiohttp.ClientSession]:
+        if self.session is not None:
+            yield self.session
+            return
         async with aiohttp.ClientSession() as session:
-            while True:
-                async with session.get(url, headers=headers, params=params) as response:
-                    await self.handle_rate_limit(response)
+            yield session
+
+    async def fetch_pages_concurrently(
+        self,
+        session: aiohttp.ClientSession,
+        url: str,
+        headers: dict,
+        params: dict,
+        pages: Iterable[int],
+    ) -> AsyncIterator[list]:
+        semaphore = asyncio.Semaphore(self.gh_concurrency)
+
+        async def fetch(page: int) -> list:
+            async with semaphore:
+                response_json, _ = await self.fetch_commit_page(
+                    session, url, headers, {**params, "page": page}
+                )
+                return response_json
+
+        tasks = [asyncio.create_task(fetch(page)) for page in pages]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def fetch_commit_page(
+        self, session: aiohttp.ClientSession, url: str, headers: dict, params: dict
+    ) -> Tuple[list, Optional[int]]:
+        cache_key = f"{url}?{urlencode(sorted(params.items()))}"
+        cached = await self.response_cache.get(cache_key) if self.response_cache is not None else None
+        if cached is not None:
+            headers = {**headers, **self.conditional_headers(cached)}
+
+        attempts = self.token_pool.size + 1 if self.token_pool is not None else 1
+        for _ in range(attempts):
+            token = None
+            request_headers = headers
+            if self.token_pool is not None:
+                token = await self.token_pool.acquire()
+                request_headers = {**headers, "Authorization": f"token {token}"}
+
+            started = time.perf_counter()
+            with phase("github"):
+                async with session.get(url, headers=request_headers, params=params) as response:
+                    GITHUB_REQUEST_SECONDS.observe(time.perf_counter() - started)
+                    GITHUB_REQUESTS.labels(str(response.status)).inc()
+                    if token is not None:
+                        self.token_pool.update(token, response.headers)
+                    if await self.is_rate_limited(response):
+                        if token is None:
+                            raise RepoServiceExceptions.RateLimitExceededException()
+                        self.token_pool.mark_exhausted(token, response.headers)
+                        continue
+                    if cached is not None and response.status == 304:
+                        return orjson.loads(cached.body), self.last_page(cached.link)
                     response.raise_for_status()
-                    response_json = await response.json()
-                    commits += len(response_json)
-                    authors.update(self.extract_authors(response_json))
-                    if len(response_json) < 100:
-                        break
-                    params["page"] = params.get("page", 1) + 1
-        return commits, authors
+                    body = await response.read()
+                    fresh = CachedResponse(
+                        response.headers.get("ETag"),
+                        response.headers.get("Last-Modified"),
+                        response.headers.get("Link"),
+                        body,
+                    )
+            if self.response_cache is not None and (fresh.etag or fresh.last_modified):
+                await self.response_cache.put(cache_key, fresh)
+            return orjson.loads(body), self.last_page(fresh.link)
+        raise RepoServiceExceptions.RateLimitExceededException()
+
+    @staticmethod
+    def conditional_headers(cached: CachedResponse) -> Dict[str, str]:
+        headers = {}
+        if cached.etag:
+            headers["If-None-Match"] = cached.etag
+        if cached.last_modified:
+            headers["If-Modified-Since"] = cached.last_modified
+        return headers
+
+    @staticmethod
+    def last_page(link: Optional[str]) -> Optional[int]:
+        for part in (link or "").split(","):
+            target, _, rel = part.partition(";")
+            if 'rel="last"' in rel:
+                page = URL(target.strip().strip("<>")).query.get("page")
+                return int(page) if page else None
+        return None
 
     @staticmethod
-    async def handle_rate_limit(response: aiohttp.ClientResponse):
-        if (
+    async def is_rate_limited(response: aiohttp.ClientResponse) -> bool:
+        if response.status == 429:
+            return True
+        return (
             response.status == 403
             and "rate limit" in (await response.json()).get("message", "").lower()
-        ):
-            raise RepoServiceExceptions.RateLimitExceededException()
+        )
 
     @staticmethod
-    def extract_authors(response_json: list) -> Set[str]:
-        return {
-            f"{commit_info['commit']['author']['name']} <{commit_info['commit']['author']['email']}>"
-            for commit_info in response_json
-        }
+    def extract_commits(response_json: list) -> List[Tuple]:
+        commits = []
+        for commit_info in response_json:
+            author = commit_info["commit"]["author"]
+            committed_at = datetime.fromisoformat(
+                commit_info["commit"]["committer"]["date"].replace("Z", "+00:00")
+            )
+            commits.append(
+                (
+                    committed_at.astimezone(timezone.utc).date(),
+                    commit_info["sha"],
+                    author["name"],
+                    author["email"],
+                    committed_at,
+                )
+            )
+        return commits
 
     @staticmethod
-    def build_response(commits: int, authors: Set[str], since: str, until: str) -> Dict:
-        return {
+    def group_days(days: List[date]) -> List[Tuple[date, date]]:
+        ranges = []
+        for day in days:
+            if ranges and ranges[-1][1] + timedelta(days=1) == day:
+                ranges[-1] = (ranges[-1][0], day)
+            else:
+                ranges.append((day, day))
+        return ranges
+
+    @staticmethod
+    def build_response(
+        commits: int,
+        authors: Iterable[str],
+        since: str,
+        until: str,
+        top_authors: Optional[List[Dict]] = None,
+    ) -> Dict:
+        response = {
             "commits": commits,
             "authors": list(authors),
             "date": {"since": since, "until": until},
         }
+        if top_authors is not None:
+            response["top_authors"] = top_authors
+        return response
+
+
+activity_batch_semaphore = asyncio.Semaphore(settings.activity_batch_concurrency)
+
+
+def get_activity_batch_semaphore() -> asyncio.Semaphore:
+    return activity_batch_semaphore
 
 
 def get_repo_service(
+    snapshot: Top100Snapshot = Depends(get_top100_snapshot),
+    top100_encoder: Top100Encoder = Depends(get_top100_encoder),
     db: AbstractDatabase = Depends(get_postgres),
+    session: Optional[aiohttp.ClientSession] = Depends(get_http_session),
+    activity_cache: ActivityCache = Depends(get_activity_cache),
+    token_pool: Optional[TokenPool] = Depends(get_token_pool),
+    batch_semaphore: asyncio.Semaphore = Depends(get_activity_batch_semaphore),
+    response_cache: Optional[ResponseCache] = Depends(get_response_cache),
 ) -> RepoService:
-    storage = PostgresRepoStorage(db)
-    return RepoService(storage)
+    storage = CachedRepoStorage(snapshot)
+    activity_storage = PostgresActivityStorage(db) if settings.activity_store_enabled else None
+    return RepoService(
+        storage,
+        top100_encoder=top100_encoder,
+        activity_storage=activity_storage,
+        session=session,
+        activity_cache=activity_cache,
+        token_pool=token_pool,
+        history_storage=PostgresHistoryStorage(db),
+        batch_semaphore=batch_semaphore,
+        response_cache=response_cache,
+    )
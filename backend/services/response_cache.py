@@ -0,0 +1,117 @@
+import asyncio
+import sqlite3
+import threading
+import time
+from typing import Dict, NamedTuple, Optional
+
+from core.settings import settings
+from enums.enums import ResponseCacheQueries
+
+"""
+Кэш ответов гитхаба для условных запросов.
+
+Для каждой страницы (url вместе с параметрами) хранится ETag,
+Last-Modified, заголовок Link и тело ответа. RepoService отправляет их
+в If-None-Match/If-Modified-Since, и на 304 страница берётся отсюда:
+такой ответ не расходует лимит токена и не тянет тело заново.
+
+Хранилище это файл sqlite, общий для всех воркеров, открывается и
+закрывается в lifespan. Размер ограничен max_bytes по сумме тел, при
+переполнении удаляются записи, которые дольше всего не использовались.
+sqlite синхронный, поэтому обращения уходят в поток через asyncio.to_thread.
+
+threading.Lock защищает соединение только внутри воркера, между
+воркерами запись сериализует сам sqlite. Файл открывается в режиме WAL,
+чтобы чтения других воркеров не ждали записи. Время использования
+(used_at) не пишется на каждое чтение: воркер копит его в памяти и
+сбрасывает одной транзакцией при следующей записи в кэш и при закрытии,
+так что попадание в кэш обходится одним SELECT.
+"""
+
+
+class CachedResponse(NamedTuple):
+    etag: Optional[str]
+    last_modified: Optional[str]
+    link: Optional[str]
+    body: bytes
+
+
+class ResponseCache:
+    def __init__(self, path: str, max_bytes: int, sql_queries=ResponseCacheQueries):
+        self._path = path
+        self.max_bytes = max_bytes
+        self.sql_queries = sql_queries
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._touched: Dict[str, float] = {}
+
+    @property
+    def is_open(self) -> bool:
+        return self._connection is not None
+
+    def open(self):
+        self._connection = sqlite3.connect(self._path, check_same_thread=False, timeout=10)
+        self._connection.execute(self.sql_queries.JOURNAL_MODE.value)
+        with self._connection:
+            self._connection.execute(self.sql_queries.CREATE_TABLE.value)
+            self._connection.execute(self.sql_queries.CREATE_INDEX.value)
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                try:
+                    with self._connection:
+                        self._flush_touched()
+                finally:
+                    self._connection.close()
+                self._connection = None
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        return await asyncio.to_thread(self._get, key)
+
+    async def put(self, key: str, response: CachedResponse):
+        if len(response.body) <= self.max_bytes:
+            await asyncio.to_thread(self._put, key, response)
+
+    def _get(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            row = self._connection.execute(self.sql_queries.SELECT.value, (key,)).fetchone()
+            if row is None:
+                return None
+            self._touched[key] = time.time()
+        return CachedResponse(*row)
+
+    def _put(self, key: str, response: CachedResponse):
+        with self._lock, self._connection:
+            self._touched.pop(key, None)
+            self._flush_touched()
+            self._connection.execute(
+                self.sql_queries.UPSERT.value, (key, *response, len(response.body), time.time())
+            )
+            self._evict()
+
+    def _flush_touched(self):
+        if self._touched:
+            self._connection.executemany(
+                self.sql_queries.TOUCH.value, [(used_at, key) for key, used_at in self._touched.items()]
+            )
+            self._touched.clear()
+
+    def _evict(self):
+        total = self._connection.execute(self.sql_queries.TOTAL_SIZE.value).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = []
+        for key, size in self._connection.execute(self.sql_queries.BY_LAST_USE.value):
+            if total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            total -= size
+        self._connection.executemany(self.sql_queries.DELETE.value, evicted)
+
+
+response_cache = ResponseCache(settings.gh_cache_path, settings.gh_cache_max_bytes)
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    return response_cache if response_cache.is_open else None
@@ -0,0 +1,150 @@
+import asyncio
+import time
+from typing import Dict, List, Mapping, Optional
+
+from core.metrics import GITHUB_RATE_LIMIT_REMAINING
+from core.settings import settings
+from exceptions.repo_service_exceptions import RepoServiceExceptions
+
+"""
+Пул токенов гитхаба с учётом лимитов.
+
+Из каждого ответа берутся X-RateLimit-Remaining/Limit/Reset, и для
+следующего запроса выбирается токен, у которого осталось больше всего лимита.
+Если лимит токена подходит к концу (меньше pace_below), запросы по нему
+растягиваются равномерно до момента сброса, а не тратятся разом.
+Если закончились все токены, запрос ждёт ближайшего сброса, но не дольше
+max_wait, после чего уже отдаём RateLimitExceededException. Так же и при
+растягивании: если очередь на токен длиннее max_wait, запрос не ждёт.
+Пока заголовков не было (например, заглушка без --rate-limit), остаток
+считается локально от default_limit, и исчерпанный счётчик просто
+заполняется заново.
+
+remaining_share это доля лимита, оставшаяся суммарно по всем токенам,
+по ней фоновый прогрев решает, можно ли ещё тратить запросы.
+
+Остаток каждого токена выставляется в метрику github_rate_limit_remaining
+при каждом изменении, с лейблом token0, token1 и т.д. по порядку.
+
+Токены в настройках перечисляются через запятую в GH_AUTH_TOKEN.
+"""
+
+
+class TokenState:
+    def __init__(self, token: str, limit: int, label: str):
+        self.token = token
+        self.label = label
+        self.limit = limit
+        self.remaining = limit
+        self.reset_at = 0.0
+        self.next_at = 0.0
+
+
+class TokenPool:
+    def __init__(
+        self,
+        tokens: List[str],
+        max_wait: float = 30.0,
+        pace_below: int = 100,
+        default_limit: int = 5000,
+    ):
+        self._states: Dict[str, TokenState] = {
+            token: TokenState(token, default_limit, f"token{index}")
+            for index, token in enumerate(tokens)
+        }
+        self._max_wait = max_wait
+        self._pace_below = pace_below
+        for state in self._states.values():
+            self._report(state)
+
+    @property
+    def size(self) -> int:
+        return len(self._states)
+
+    async def acquire(self) -> str:
+        while True:
+            now = time.time()
+            for state in self._states.values():
+                # Без заголовков момент сброса неизвестен, и локальный счётчик
+                # только прикидка: исчерпав его, считаем лимит снова полным
+                if state.reset_at <= now and (state.reset_at or state.remaining <= 0):
+                    state.remaining = state.limit
+                    state.reset_at = 0.0
+
+            candidates = [state for state in self._states.values() if state.remaining > 0]
+            if candidates:
+                state = max(candidates, key=lambda candidate: candidate.remaining)
+                delay = self._pace(state, now)
+                state.remaining -= 1
+                self._report(state)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                return state.token
+
+            wait = min(state.reset_at for state in self._states.values()) - now
+            if wait > self._max_wait:
+                raise RepoServiceExceptions.RateLimitExceededException()
+            await asyncio.sleep(max(wait, 0))
+
+    def _pace(self, state: TokenState, now: float) -> float:
+        if state.remaining >= self._pace_below or state.reset_at <= now:
+            return 0.0
+        interval = (state.reset_at - now) / state.remaining
+        delay = max(state.next_at - now, 0.0)
+        if delay > self._max_wait:
+            raise RepoServiceExceptions.RateLimitExceededException()
+        state.next_at = max(state.next_at, now) + interval
+        return delay
+
+    def update(self, token: str, headers: Mapping[str, str]):
+        state = self._states.get(token)
+        if state is None or "X-RateLimit-Remaining" not in headers:
+            return
+        state.remaining = int(headers["X-RateLimit-Remaining"])
+        state.limit = int(headers.get("X-RateLimit-Limit", state.limit))
+        state.reset_at = float(headers.get("X-RateLimit-Reset", state.reset_at))
+        self._report(state)
+
+    def mark_exhausted(self, token: str, headers: Mapping[str, str]):
+        state = self._states.get(token)
+        if state is None:
+            return
+        state.remaining = 0
+        if "Retry-After" in headers:
+            state.reset_at = time.time() + float(headers["Retry-After"])
+        elif "X-RateLimit-Reset" in headers:
+            state.reset_at = float(headers["X-RateLimit-Reset"])
+        else:
+            state.reset_at = time.time() + 60
+        self._report(state)
+
+    @staticmethod
+    def _report(state: TokenState):
+        GITHUB_RATE_LIMIT_REMAINING.labels(state.label).set(state.remaining)
+
+    def remaining_share(self) -> float:
+        now = time.time()
+        limit = sum(state.limit for state in self._states.values())
+        remaining = sum(
+            state.limit if state.reset_at and state.reset_at <= now else state.remaining
+            for state in self._states.values()
+        )
+        return remaining / limit if limit else 0.0
+
+    def remaining(self) -> Dict[str, int]:
+        return {state.token: state.remaining for state in self._states.values()}
+
+
+def parse_tokens(value: str) -> List[str]:
+    return [token.strip() for token in value.split(",") if token.strip()]
+
+
+token_pool = TokenPool(
+    parse_tokens(settings.gh_auth_token),
+    max_wait=settings.gh_rate_limit_max_wait,
+    pace_below=settings.gh_rate_limit_pace_below,
+)
+
+
+def get_token_pool() -> Optional[TokenPool]:
+    return token_pool if token_pool.size else None
@@ -0,0 +1,137 @@
+import gzip
+import hashlib
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import brotli
+import orjson
+from core.profiling import phase
+from db.cache import CachedRepoStorage, Top100Snapshot, top100_snapshot
+from db.postgres import TOP100_FIELDS
+from fastapi import Response
+from pydantic import TypeAdapter
+from schemas.response_schemas import RepoResponse
+
+"""
+Готовые ответы для /top100.
+
+Пока снимок топ100 не поменялся, ответ на один и тот же вариант сортировки
+всегда одинаковый. Поэтому каждый вариант один раз валидируется через
+RepoResponse, кодируется в json и сжимается gzip и brotli, а дальше
+отдаются уже готовые байты.
+
+ETag строится из версии снимка и варианта сортировки, у каждой кодировки
+свой суффикс. Если клиент прислал совпадающий If-None-Match, отвечаем 304
+без обращения к базе и к pydantic.
+
+Неизвестные sort_by/sort_order сводятся к варианту по умолчанию,
+поэтому вариантов ограниченное число и кэш не растёт от произвольных запросов.
+"""
+
+_repos_adapter = TypeAdapter(List[RepoResponse])
+
+
+class EncodedTop100(NamedTuple):
+    etag: str
+    identity: bytes
+    gzip: bytes
+    br: bytes
+
+
+class Top100Encoder:
+    def __init__(self, snapshot: Top100Snapshot):
+        self._snapshot = snapshot
+        self._storage = CachedRepoStorage(snapshot)
+        self._version: Optional[str] = None
+        self._variants: Dict[Tuple[Optional[str], str], EncodedTop100] = {}
+
+    @staticmethod
+    def normalize(sort_by: Optional[str], sort_order: Optional[str]) -> Tuple[Optional[str], str]:
+        if sort_by not in TOP100_FIELDS:
+            return None, "asc"
+        return sort_by, "asc" if (sort_order or "asc").lower() == "asc" else "desc"
+
+    async def get(self, sort_by: Optional[str] = None, sort_order: Optional[str] = "asc") -> EncodedTop100:
+        await self._snapshot.get()
+        version = self._snapshot.version
+        if version != self._version:
+            self._variants = {}
+            self._version = version
+
+        key = self.normalize(sort_by, sort_order)
+        encoded = self._variants.get(key)
+        if encoded is None:
+            encoded = await self._encode(version, *key)
+            self._variants[key] = encoded
+        return encoded
+
+    async def _encode(self, version: str, sort_by: Optional[str], sort_order: str) -> EncodedTop100:
+        repositories = await self._storage.get_top100(sort_by=sort_by, sort_order=sort_order)
+        with phase("encode"):
+            validated = _repos_adapter.validate_python(repositories)
+            body = orjson.dumps(_repos_adapter.dump_python(validated, mode="json"))
+        etag = hashlib.blake2b(
+            f"{version}:{sort_by}:{sort_order}".encode(), digest_size=12
+        ).hexdigest()
+        return EncodedTop100(
+            etag=etag,
+            identity=body,
+            gzip=gzip.compress(body, compresslevel=9),
+            br=brotli.compress(body, quality=11),
+        )
+
+
+def _accepted_encodings(accept_encoding: str) -> set:
+    accepted = set()
+    for part in accept_encoding.split(","):
+        coding, _, params = part.partition(";")
+        name, _, value = params.partition("=")
+        if name.strip() == "q":
+            try:
+                if float(value) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        # Любая кодировка одного и того же варианта считается совпадением
+        if candidate.strip('"').split("-")[0] == etag:
+            return True
+    return False
+
+
+def build_top100_response(
+    encoded: EncodedTop100, if_none_match: Optional[str], accept_encoding: Optional[str]
+) -> Response:
+    headers = {"Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+    accepted = _accepted_encodings(accept_encoding or "")
+
+    if "br" in accepted:
+        body, suffix = encoded.br, "-br"
+        headers["Content-Encoding"] = "br"
+    elif "gzip" in accepted:
+        body, suffix = encoded.gzip, "-gzip"
+        headers["Content-Encoding"] = "gzip"
+    else:
+        body, suffix = encoded.identity, ""
+    headers["ETag"] = f'"{encoded.etag}{suffix}"'
+
+    if if_none_match and _etag_matches(if_none_match, encoded.etag):
+        headers.pop("Content-Encoding", None)
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+top100_encoder = Top100Encoder(top100_snapshot)
+
+
+def get_top100_encoder() -> Top100Encoder:
+    return top100_encoder
@@ -0,0 +1,57 @@
+import base64
+import binascii
+from typing import Dict, List, Optional, Tuple
+
+import orjson
+from db.postgres import TOP100_FIELDS
+from exceptions.repo_service_exceptions import RepoServiceExceptions
+from fastapi import Response
+
+"""
+Разбор параметров выборки /top100 и постраничный ответ.
+
+fields это список колонок через запятую, неизвестные колонки дают 400.
+
+Курсор непрозрачный для клиента: это base64 от json с сортировкой,
+для которой он выдан, и ключом последней строки (значение sort_by и repo).
+Курсор от другой сортировки или испорченный курсор дают 400.
+Если после страницы есть ещё строки, курсор на следующую
+отдаётся в заголовке X-Next-Cursor.
+"""
+
+
+def parse_fields(fields: Optional[str]) -> Optional[Tuple[str, ...]]:
+    if not fields:
+        return None
+    requested = tuple(dict.fromkeys(field.strip() for field in fields.split(",") if field.strip()))
+    unknown = [field for field in requested if field not in TOP100_FIELDS]
+    if unknown:
+        raise RepoServiceExceptions.InvalidQueryException(
+            f"Unknown fields: {', '.join(unknown)}"
+        )
+    return requested or None
+
+
+def encode_cursor(sort_by: str, sort_order: str, row: Dict) -> str:
+    payload = orjson.dumps([sort_by, sort_order, row[sort_by], row["repo"]])
+    return base64.urlsafe_b64encode(payload).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str, sort_by: str, sort_order: str) -> Tuple:
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_sort_by, cursor_sort_order, value, repo = orjson.loads(payload)
+    except (binascii.Error, orjson.JSONDecodeError, ValueError, TypeError):
+        raise RepoServiceExceptions.InvalidQueryException("Invalid cursor")
+    if (cursor_sort_by, cursor_sort_order) != (sort_by, sort_order):
+        raise RepoServiceExceptions.InvalidQueryException(
+            "Cursor was issued for a different sort order"
+        )
+    return value, repo
+
+
+def build_top100_page_response(rows: List[Dict], next_cursor: Optional[str]) -> Response:
+    headers = {"Cache-Control": "no-cache"}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    return Response(content=orjson.dumps(rows), media_type="application/json", headers=headers)
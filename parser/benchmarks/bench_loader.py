@@ -0,0 +1,69 @@
+import argparse
+import json
+import time
+
+from benchmarks.common import CREATE_TABLE, CountingHandler, synthetic_repos
+from loader.loader import Loader
+
+"""
+Бенчмарк загрузки: построчный путь (UPDATE, затем INSERT) против
+bulk-загрузки (многострочный INSERT ... ON CONFLICT в одной транзакции).
+
+Запускать из папки parser на отдельной (тестовой) базе, т.к. таблица top100
+очищается перед каждым прогоном:
+
+    DB_NAME=bench ... python -m benchmarks.bench_loader --sizes 100 10000 100000
+
+Каждый размер грузится трижды: первый прогон в пустую таблицу (только вставки),
+второй поверх уже загруженных данных (только обновления), третий теми же
+данными (ничего не поменялось, строки пропускаются).
+"""
+
+
+def run_load(handler: CountingHandler, data: list, bulk: bool) -> dict:
+    loader = Loader(handler, bulk=bulk)
+    handler.reset_counters()
+    started = time.perf_counter()
+    stats = loader.process_data(data)
+    elapsed = time.perf_counter() - started
+    return {
+        **stats,
+        "seconds": round(elapsed, 4),
+        "rows_per_sec": round(len(data) / elapsed, 1),
+        "round_trips": handler.round_trips,
+        "commits": handler.commits,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 10000, 100000])
+    args = parser.parse_args()
+
+    handler = CountingHandler()
+    handler.execute(CREATE_TABLE, ())
+    handler.prepare_storage()
+
+    results = []
+    for size in args.sizes:
+        data = synthetic_repos(size)
+        updated = synthetic_repos(size, seed=1)
+        for mode, bulk in (("per_row", False), ("bulk", True)):
+            handler.execute("TRUNCATE top100", ())
+            results.append(
+                {"size": size, "mode": mode, "phase": "insert", **run_load(handler, data, bulk)}
+            )
+            results.append(
+                {"size": size, "mode": mode, "phase": "update", **run_load(handler, updated, bulk)}
+            )
+            results.append(
+                {"size": size, "mode": mode, "phase": "unchanged", **run_load(handler, updated, bulk)}
+            )
+            for result in results[-3:]:
+                print(json.dumps(result))
+
+    handler.db_pool.closeall()
+
+
+if __name__ == "__main__":
+    main()
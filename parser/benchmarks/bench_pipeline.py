@@ -0,0 +1,146 @@
+import argparse
+import json
+import time
+import tracemalloc
+from bisect import bisect_left, bisect_right
+from typing import List, Optional
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
+
+from benchmarks.common import CREATE_TABLE, CountingHandler, synthetic_search_payload
+from fetcher.fetcher import SEARCH_LIMIT, Fetcher
+from loader.loader import Loader
+
+"""
+Бенчмарк всего прогона парсера так же, как в handler:
+Fetcher.fetch_pages -> Loader.process_fetched -> PostgresHandler
+на синтетической выдаче поиска гитхаба (100 / 10k / 100k репозиториев).
+
+HTTP запрос к гитхабу подменяется заглушкой StubSearch: она отвечает
+на поиск по звёздам (>N, >=N, a..b) страницами по per_page с Link
+rel="next" и потолком в 1000 результатов, как настоящий поиск. Поэтому
+больше 1000 репозиториев идут через разбиение на диапазоны (crawl_shards),
+а меньше через prefetch_pages, с фоновым потоком и записью по страницам.
+Тела ответов сериализуются заранее, холостым обходом до замера, так что
+в замер fetch попадает разбор json, но не сеть. База настоящая (DB_* из
+окружения), таблица top100 очищается перед каждым размером, поэтому
+запускать на тестовой базе:
+
+    DB_NAME=bench ... python -m benchmarks.bench_pipeline --sizes 100 10000 100000
+
+Для каждого размера два прогона: холодный (пустая таблица) и повторный
+с теми же данными. Отчёт: время каждого этапа, строк в секунду,
+количество обращений к базе и пиковая память (tracemalloc), в json.
+fetch это суммарное время запросов в потоках загрузки, оно идёт
+параллельно с остальными этапами.
+"""
+
+MIN_STARS = 49999
+
+
+class StubResponse:
+    status_code = 200
+
+    def __init__(self, body: bytes, next_url: Optional[str]):
+        self.content = body
+        self.text = ""
+        self.headers = {"Link": f'<{next_url}>; rel="next"'} if next_url else {}
+        self.links = {"next": {"url": next_url, "rel": "next"}} if next_url else {}
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class StubSearch:
+    def __init__(self, payload: dict):
+        self._items = payload["items"]
+        # Звёзды по возрастанию для bisect, выдача по убыванию
+        self._stars = sorted(item["stargazers_count"] for item in self._items)
+        self._bodies = {}
+
+    def matching(self, query: str) -> List[dict]:
+        if query.startswith(">="):
+            low, high = int(query[2:]), None
+        elif query.startswith(">"):
+            low, high = int(query[1:]) + 1, None
+        else:
+            low, high = (int(bound) for bound in query.split(".."))
+        total = len(self._stars)
+        first = total - bisect_right(self._stars, high) if high is not None else 0
+        last = total - bisect_left(self._stars, low)
+        return self._items[first:last]
+
+    def __call__(self, url: str, headers: Optional[dict] = None) -> StubResponse:
+        cached = self._bodies.get(url)
+        if cached is None:
+            query = parse_qs(urlsplit(url).query)
+            per_page = int(query["per_page"][0])
+            page = int(query.get("page", ["1"])[0])
+            matched = self.matching(query["q"][0].split(":", 1)[1])
+            reachable = min(len(matched), SEARCH_LIMIT)
+            items = matched[(page - 1) * per_page:min(page * per_page, reachable)]
+            next_url = None
+            if page * per_page < reachable:
+                next_url = f"{url.split('&page=')[0]}&page={page + 1}"
+            body = json.dumps(
+                {"total_count": len(matched), "incomplete_results": False, "items": items}
+            ).encode()
+            cached = self._bodies[url] = (body, next_url)
+        return StubResponse(*cached)
+
+
+def run_pipeline(handler: CountingHandler, search: StubSearch, size: int) -> dict:
+    fetcher = Fetcher(max_results=size, min_stars=MIN_STARS)
+    loader = Loader(handler)
+    handler.reset_counters()
+
+    tracemalloc.start()
+    started = time.perf_counter()
+
+    with mock.patch("fetcher.fetcher.get", side_effect=search):
+        stats = loader.process_fetched(fetcher.fetch_pages())
+
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    timings = {"fetch": fetcher.fetch_seconds, **loader.timings}
+    return {
+        **stats,
+        "seconds": round(elapsed, 4),
+        "rows_per_sec": round(size / elapsed, 1),
+        "round_trips": handler.round_trips,
+        "commits": handler.commits,
+        "peak_memory_mb": round(peak / 2**20, 2),
+        "stages": {stage: round(seconds, 4) for stage, seconds in timings.items()},
+    }
+
+
+def warm_up(search: StubSearch, size: int):
+    fetcher = Fetcher(max_results=size, min_stars=MIN_STARS)
+    with mock.patch("fetcher.fetcher.get", side_effect=search):
+        for _ in fetcher.fetch_pages():
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 10000, 100000])
+    args = parser.parse_args()
+
+    handler = CountingHandler()
+    handler.execute(CREATE_TABLE, ())
+    handler.prepare_storage()
+
+    for size in args.sizes:
+        search = StubSearch(synthetic_search_payload(size))
+        warm_up(search, size)
+        handler.execute("TRUNCATE top100", ())
+        for run in ("cold", "repeat"):
+            print(json.dumps({"size": size, "run": run, **run_pipeline(handler, search, size)}))
+
+    handler.db_pool.closeall()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import math
+import random
+
+from db.postgres import PostgresHandler
+
+"""
+Общее для бенчмарков парсера: синтетические данные, схема top100
+и обёртка над PostgresHandler, которая считает обращения к базе.
+"""
+
+CREATE_TABLE = """
+    CREATE TABLE IF NOT EXISTS top100 (
+        repo TEXT NOT NULL,
+        owner TEXT NOT NULL,
+        position_cur INTEGER NOT NULL DEFAULT 0,
+        position_prev INTEGER NOT NULL DEFAULT 0,
+        stars INTEGER NOT NULL,
+        watchers INTEGER NOT NULL,
+        forks INTEGER NOT NULL,
+        open_issues INTEGER NOT NULL,
+        language TEXT
+    )
+"""
+
+LANGUAGES = ["Python", "Go", "Rust", "TypeScript", None]
+
+
+class CountingHandler(PostgresHandler):
+    def __init__(self):
+        super().__init__()
+        self.round_trips = 0
+        self.commits = 0
+
+    def reset_counters(self):
+        super().reset_counters()
+        self.round_trips = 0
+        self.commits = 0
+
+    def execute_query(self, query, params):
+        self.round_trips += 1
+        self.commits += 1
+        return super().execute_query(query, params)
+
+    def execute_update(self, query, params):
+        self.round_trips += 1
+        self.commits += 1
+        return super().execute_update(query, params)
+
+    def execute(self, query, params):
+        self.round_trips += 1
+        self.commits += 1
+        super().execute(query, params)
+
+    def execute_many(self, query, params, page_size=1000):
+        self.round_trips += math.ceil(len(params) / page_size)
+        self.commits += 1
+        super().execute_many(query, params, page_size)
+
+    def copy(self, query, rows):
+        self.round_trips += 1
+        self.commits += 1
+        super().copy(query, rows)
+
+
+def synthetic_repos(count: int, seed: int = 0) -> list:
+    rnd = random.Random(seed)
+    return [
+        (
+            f"owner{i}/repo{i}",
+            f"owner{i}",
+            rnd.randint(50000, 400000),
+            rnd.randint(50000, 400000),
+            rnd.randint(0, 80000),
+            rnd.randint(0, 10000),
+            rnd.choice(LANGUAGES),
+            0,
+            0,
+        )
+        for i in range(count)
+    ]
+
+
+def synthetic_search_payload(count: int, seed: int = 0) -> dict:
+    rnd = random.Random(seed)
+    items = []
+    for i in range(count):
+        stars = rnd.randint(50000, 400000)
+        items.append(
+            {
+                "id": i,
+                "full_name": f"owner{i}/repo{i}",
+                "owner": {"login": f"owner{i}", "id": i},
+                "stargazers_count": stars,
+                "watchers_count": stars,
+                "forks_count": rnd.randint(0, 80000),
+                "open_issues_count": rnd.randint(0, 10000),
+                "language": rnd.choice(LANGUAGES),
+                "description": "synthetic repository " * 4,
+            }
+        )
+    items.sort(key=lambda item: item["stargazers_count"], reverse=True)
+    return {"total_count": count, "incomplete_results": False, "items": items}
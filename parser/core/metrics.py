@@ -0,0 +1,66 @@
+import logging
+
+from core.settings import settings
+
+"""
+Метрики прогона парсера. Функция живёт несколько секунд раз в 3 часа,
+поэтому метрики не скрейпятся, а отправляются в Pushgateway в конце прогона
+(если задан PUSHGATEWAY_URL). Те же значения возвращаются в ответе handler.
+Ошибка отправки метрик не роняет прогон.
+prometheus_client импортируется только если Pushgateway задан,
+чтобы не платить за импорт на холодном старте впустую.
+"""
+
+
+def build_run_metrics(
+    success: bool, fetch_seconds: float, stage_seconds: dict, stats: dict, db_handler, startup: dict
+) -> dict:
+    return {
+        "success": int(success),
+        "startup": startup,
+        "fetch_seconds": round(fetch_seconds, 4),
+        "stage_seconds": {stage: round(seconds, 4) for stage, seconds in stage_seconds.items()},
+        "rows": stats,
+        "db_retries": db_handler.retries if db_handler else 0,
+        "db_reconnects": db_handler.reconnects if db_handler else 0,
+    }
+
+
+def push_run_metrics(run_metrics: dict):
+    if not settings.pushgateway_url:
+        return
+
+    from prometheus_client import CollectorRegistry, Gauge, push_to_gateway
+
+    registry = CollectorRegistry()
+    Gauge("parser_last_run_success", "Whether the last run succeeded", registry=registry).set(
+        run_metrics["success"]
+    )
+    Gauge("parser_cold_start", "Whether the run started a new instance", registry=registry).set(
+        run_metrics["startup"]["cold_start"]
+    )
+    Gauge("parser_setup_seconds", "Time spent on imports and connecting", registry=registry).set(
+        run_metrics["startup"]["setup_seconds"]
+    )
+    Gauge("parser_fetch_seconds", "Time spent fetching from GitHub", registry=registry).set(
+        run_metrics["fetch_seconds"]
+    )
+    stage_seconds = Gauge(
+        "parser_stage_seconds", "Time spent per loader stage", ["stage"], registry=registry
+    )
+    for stage, seconds in run_metrics["stage_seconds"].items():
+        stage_seconds.labels(stage).set(seconds)
+    rows = Gauge("parser_rows", "Rows by write outcome", ["outcome"], registry=registry)
+    for outcome, count in run_metrics["rows"].items():
+        rows.labels(outcome).set(count)
+    Gauge("parser_db_retries", "Database retries during the run", registry=registry).set(
+        run_metrics["db_retries"]
+    )
+    Gauge("parser_db_reconnects", "Database reconnects during the run", registry=registry).set(
+        run_metrics["db_reconnects"]
+    )
+
+    try:
+        push_to_gateway(settings.pushgateway_url, job="parser", registry=registry)
+    except Exception as e:
+        logging.error(f"Error pushing metrics: {e}")
@@ -0,0 +1,65 @@
+import json
+import logging
+import os
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+
+"""
+Режим профилирования прогона парсера.
+
+Включается полем "profile": true в событии вызова или PROFILE_RUNS=true.
+В PROFILE_DIR пишутся два файла с общим id (он же в metrics.profile ответа):
+
+- <id>.json: метрики прогона, в том числе время по этапам:
+  fetch_seconds (запросы к гитхабу) и stage_seconds загрузчика
+  (transform, rank, upsert, history и т.д.);
+- <id>.html: сэмплирующий профиль pyinstrument с интервалом
+  PROFILE_INTERVAL.
+
+Страницы скачиваются в фоновых потоках, а pyinstrument снимает только
+основной поток, поэтому в html скачивание видно как ожидание очереди,
+а чистое время запросов есть в fetch_seconds.
+"""
+
+_sampler_missing_logged = False
+
+
+class RunProfiler:
+    def __init__(self, directory: str, interval: float):
+        self.directory = directory
+        self.interval = interval
+        self.profile_id = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+        self._sampler = None
+
+    def start(self):
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            global _sampler_missing_logged
+            if not _sampler_missing_logged:
+                logging.warning("pyinstrument is not installed, profiles will contain stages only")
+                _sampler_missing_logged = True
+            return
+        self._sampler = Profiler(interval=self.interval)
+        self._sampler.start()
+
+    def finish(self, run_metrics: dict) -> Optional[str]:
+        if self._sampler is not None:
+            self._sampler.stop()
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, self.profile_id)
+            with open(f"{path}.json", "w", encoding="utf-8") as file:
+                json.dump({"id": self.profile_id, **run_metrics}, file, indent=2)
+            if self._sampler is not None:
+                with open(f"{path}.html", "w", encoding="utf-8") as file:
+                    file.write(self._sampler.output_html())
+        except Exception as e:
+            logging.error(f"Error writing profile {self.profile_id}: {e}")
+            return None
+        return self.profile_id
+
+
+def profile_requested(event, enabled: bool) -> bool:
+    return enabled or (isinstance(event, dict) and bool(event.get("profile")))
@@ -1,3 +1,6 @@
+import os
+import tempfile
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 """
@@ -14,5 +17,21 @@ class Settings(BaseSettings):
     db_user: str
     db_pass: str
 
+    top100_channel: str = "top100_updated"
+
+    gh_auth_token: str = ""
+    gh_max_results: int = 100
+    gh_min_stars: int = 50000
+    gh_shard_workers: int = 4
+    gh_cache_path: str = os.path.join(tempfile.gettempdir(), "github_cache.sqlite")
+    gh_cache_max_bytes: int = 64 * 1024 * 1024
+    gh_rate_limit_max_wait: float = 60.0
+
+    pushgateway_url: str = ""
+
+    profile_runs: bool = False
+    profile_dir: str = os.path.join(tempfile.gettempdir(), "parser_profiles")
+    profile_interval: float = 0.001
+
 
 settings = Settings()
@@ -4,17 +4,25 @@ from abc import ABC, abstractmethod
 """
 Абстрактный класс, который гарантирует наличие необходимых методов,
 в случае, если мы захотим изменить и/или добавить ещё одну бд. Это
-повышает переиспользуемость кода, а также локализует возможные ошибки. 
+повышает переиспользуемость кода, а также локализует возможные ошибки.
 """
 
 
 class StorageHandler(ABC):
+    @abstractmethod
+    def prepare_storage(self):
+        pass
+
     @abstractmethod
     def upsert_repo(self, item):
         pass
 
     @abstractmethod
-    def update_positions(self):
+    def upsert_repos(self, items, page_size):
+        pass
+
+    @abstractmethod
+    def ensure_history_partition(self, captured_at):
         pass
 
     @abstractmethod
@@ -28,3 +36,11 @@ class StorageHandler(ABC):
     @abstractmethod
     def execute(self, query, params):
         pass
+
+    @abstractmethod
+    def execute_many(self, query, params, page_size):
+        pass
+
+    @abstractmethod
+    def copy(self, query, rows):
+        pass
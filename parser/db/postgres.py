@@ -1,10 +1,14 @@
+import csv
+import io
 import logging
+from datetime import datetime, timedelta
 
 import backoff
 from core.settings import settings
 from db.abc_db import StorageHandler
 from enums.enums import SQLQueries
 from psycopg2 import DatabaseError, InterfaceError, OperationalError, pool
+from psycopg2.extras import execute_values
 
 """
 Выглядит страшно, но на самом деле логика довольно простая.
@@ -12,13 +16,34 @@ from psycopg2 import DatabaseError, InterfaceError, OperationalError, pool
 Это делает код отказоустойчивым, а также гарантирует выполнение вставки/обновления
 в случае падения базы на короткий промежуток времени. Также предусмотрена обработка
 различных видов ошибок.
+
+execute_many отправляет сразу много строк через execute_values
+(многострочный INSERT) в одной транзакции с одним коммитом, вместо
+отдельного запроса и коммита на каждую строку.
+
+copy грузит строки через COPY FROM STDIN, это самый быстрый способ
+дописать много строк (используется для истории топа).
+История партиционирована по месяцам, нужная партиция создаётся
+перед записью в ensure_history_partition.
+
+retries и reconnects считают повторы (backoff) и переподключения,
+они уходят в метрики прогона. Обработчик переживает тёплые вызовы
+функции, поэтому счётчики сбрасываются в начале каждого прогона
+(reset_counters), а перед повторным использованием пул проверяется
+через is_alive.
 """
 
 
+def _count_retry(details):
+    details["args"][0].retries += 1
+
+
 class PostgresHandler(StorageHandler):
     def __init__(self, sql_queries=SQLQueries) -> None:
         self.__create_connection_pool()
         self.sql_queries = sql_queries
+        self.retries = 0
+        self.reconnects = 0
 
     def __create_connection_pool(self):
         self.db_pool = pool.SimpleConnectionPool(
@@ -31,7 +56,9 @@ class PostgresHandler(StorageHandler):
             database=settings.db_name
         )
 
-    @backoff.on_exception(backoff.expo, OperationalError, max_tries=10, max_time=60)
+    @backoff.on_exception(
+        backoff.expo, OperationalError, max_tries=10, max_time=60, on_backoff=_count_retry
+    )
     def __get_postgres(self):
         if self.db_pool.closed:
             self.__create_connection_pool()
@@ -77,8 +104,65 @@ class PostgresHandler(StorageHandler):
         finally:
             self.db_pool.putconn(conn)
 
+    def __execute_many(self, query, params):
+        rows, page_size = params
+        conn = self.__get_postgres()
+        try:
+            with conn.cursor() as cursor:
+                execute_values(cursor, query, rows, page_size=page_size)
+                conn.commit()
+        except Exception as e:
+            logging.error(f"Error executing batch: {e}")
+            raise
+        finally:
+            self.db_pool.putconn(conn)
+
+    def __execute_copy(self, query, params):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(params)
+        buffer.seek(0)
+        conn = self.__get_postgres()
+        try:
+            with conn.cursor() as cursor:
+                cursor.copy_expert(query, buffer)
+                conn.commit()
+        except Exception as e:
+            logging.error(f"Error executing copy: {e}")
+            raise
+        finally:
+            self.db_pool.putconn(conn)
+
+    def is_alive(self) -> bool:
+        if self.db_pool.closed:
+            return False
+        try:
+            conn = self.db_pool.getconn()
+        except Exception as e:
+            logging.error(f"Error checking connection: {e}")
+            return False
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(self.sql_queries.PING.value)
+                cursor.fetchone()
+            conn.rollback()
+        except Exception as e:
+            logging.error(f"Error checking connection: {e}")
+            self.db_pool.putconn(conn, close=True)
+            return False
+        self.db_pool.putconn(conn)
+        return True
+
+    def reset_counters(self):
+        self.retries = 0
+        self.reconnects = 0
+
+    def close(self):
+        if not self.db_pool.closed:
+            self.db_pool.closeall()
+
     def __reconnect(self):
         logging.info("Reconnecting to the database...")
+        self.reconnects += 1
         self.db_pool.closeall()
         self.__create_connection_pool()
         logging.info("Reconnection successful.")
@@ -101,18 +185,56 @@ class PostgresHandler(StorageHandler):
             logging.error(f"An unexpected error occurred: {e}")
             raise
 
-    @backoff.on_exception(backoff.expo, (InterfaceError, OperationalError), max_tries=5)
+    @backoff.on_exception(
+        backoff.expo, (InterfaceError, OperationalError), max_tries=5, on_backoff=_count_retry
+    )
     def execute_query(self, query, params):
         return self._execute_with_reconnect(self.__execute_query, query, params)
 
-    @backoff.on_exception(backoff.expo, (InterfaceError, OperationalError), max_tries=5)
+    @backoff.on_exception(
+        backoff.expo, (InterfaceError, OperationalError), max_tries=5, on_backoff=_count_retry
+    )
     def execute_update(self, query, params):
         return self._execute_with_reconnect(self.__execute_update, query, params)
 
-    @backoff.on_exception(backoff.expo, (InterfaceError, OperationalError), max_tries=5)
+    @backoff.on_exception(
+        backoff.expo, (InterfaceError, OperationalError), max_tries=5, on_backoff=_count_retry
+    )
     def execute(self, query, params):
         self._execute_with_reconnect(self.__execute_simple, query, params)
 
+    @backoff.on_exception(
+        backoff.expo, (InterfaceError, OperationalError), max_tries=5, on_backoff=_count_retry
+    )
+    def execute_many(self, query, params, page_size=1000):
+        self._execute_with_reconnect(self.__execute_many, query, (params, page_size))
+
+    @backoff.on_exception(
+        backoff.expo, (InterfaceError, OperationalError), max_tries=5, on_backoff=_count_retry
+    )
+    def copy(self, query, rows):
+        self._execute_with_reconnect(self.__execute_copy, query, rows)
+
+    def prepare_storage(self):
+        self.execute(self.sql_queries.DELETE_DUPLICATE_REPOS.value, ())
+        self.execute(self.sql_queries.CREATE_REPO_UNIQUE_INDEX.value, ())
+        self.execute(self.sql_queries.CREATE_TOP100_QUERY_INDEXES.value, ())
+        self.execute(self.sql_queries.CREATE_ARCHIVE_TABLE.value, ())
+        self.execute(self.sql_queries.CREATE_HISTORY_TABLE.value, ())
+
+    def ensure_history_partition(self, captured_at: datetime):
+        start = captured_at.date().replace(day=1)
+        end = (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+        self.execute(
+            self.sql_queries.CREATE_HISTORY_PARTITION.value.format(
+                suffix=start.strftime("%Y%m"), start=start.isoformat(), end=end.isoformat()
+            ),
+            (),
+        )
+
+    def upsert_repos(self, items, page_size=1000):
+        self.execute_many(self.sql_queries.UPSERT_REPOS.value, items, page_size)
+
     def upsert_repo(self, item):
         update_query = self.sql_queries.UPDATE_REPO.value
         insert_query = self.sql_queries.INSERT_REPO.value
@@ -126,6 +248,7 @@ class PostgresHandler(StorageHandler):
                     item[4],
                     item[5],
                     item[6],
+                    item[7],
                     item[8],
                     item[0],
                 ),
@@ -133,6 +256,3 @@ class PostgresHandler(StorageHandler):
             == 0
         ):
             self.execute(insert_query, (*item,))
-
-    def update_positions(self):
-        self.execute(self.sql_queries.UPDATE_POSITIONS.value, ())
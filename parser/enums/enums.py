@@ -9,7 +9,7 @@ from enum import Enum
 
 class GitHubURL(str, Enum):
     BASE_URL = "https://api.github.com/"
-    REPOS_URL = "https://api.github.com/search/repositories?q=stars:%3E50000&sort=stars&order=desc&per_page=100"
+    SEARCH_REPOS_URL = "https://api.github.com/search/repositories?q=stars:{stars}&sort=stars&order=desc&per_page={per_page}"
 
 
 class SQLQueries(Enum):
@@ -21,25 +21,148 @@ class SQLQueries(Enum):
             forks = %s,
             open_issues = %s,
             language = %s,
-            position_prev = position_cur,
+            position_prev = %s,
             position_cur = %s
         WHERE repo = %s
         RETURNING repo
     """
 
-    UPDATE_POSITIONS = """
-        WITH ranked_repos AS (
-            SELECT repo, ROW_NUMBER() OVER (ORDER BY stars DESC) AS rank
-            FROM top100
+    SELECT_REPOS = """
+        SELECT repo, owner, stars, watchers, forks, open_issues, language, position_prev, position_cur
+        FROM top100
+    """
+
+    ARCHIVE_DROPPED_REPOS = """
+        WITH dropped AS (
+            DELETE FROM top100
+            WHERE NOT (repo = ANY(%s)) AND (stars < %s OR position_cur = 0)
+            RETURNING repo, owner, stars, watchers, forks, open_issues, language, position_prev, position_cur
         )
-        UPDATE top100 SET
-            position_prev = position_cur,
-            position_cur = ranked_repos.rank
-        FROM ranked_repos
-        WHERE top100.repo = ranked_repos.repo;
+        INSERT INTO top100_archive (repo, owner, stars, watchers, forks, open_issues, language, position_prev, position_cur)
+        SELECT repo, owner, stars, watchers, forks, open_issues, language, position_prev, position_cur
+        FROM dropped
+    """
+
+    UNRANK_MISSING_REPOS = """
+        UPDATE top100
+        SET position_prev = position_cur,
+            position_cur = 0
+        WHERE NOT (repo = ANY(%s)) AND position_cur <> 0
     """
 
     INSERT_REPO = """
         INSERT INTO top100 (repo, owner, stars, watchers, forks, open_issues, language, position_prev, position_cur)
         VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
     """
+
+    UPSERT_REPOS = """
+        INSERT INTO top100 (repo, owner, stars, watchers, forks, open_issues, language, position_prev, position_cur)
+        VALUES %s
+        ON CONFLICT (repo) DO UPDATE SET
+            owner = EXCLUDED.owner,
+            stars = EXCLUDED.stars,
+            watchers = EXCLUDED.watchers,
+            forks = EXCLUDED.forks,
+            open_issues = EXCLUDED.open_issues,
+            language = EXCLUDED.language,
+            position_prev = EXCLUDED.position_prev,
+            position_cur = EXCLUDED.position_cur
+    """
+
+    NOTIFY_UPDATED = """
+        SELECT pg_notify(%s, %s)
+    """
+
+    PING = "SELECT 1"
+
+    CREATE_ARCHIVE_TABLE = """
+        CREATE TABLE IF NOT EXISTS top100_archive (
+            LIKE top100,
+            archived_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+    """
+
+    CREATE_HISTORY_TABLE = """
+        CREATE TABLE IF NOT EXISTS top100_history (
+            captured_at TIMESTAMPTZ NOT NULL,
+            repo TEXT NOT NULL,
+            stars INTEGER NOT NULL,
+            forks INTEGER NOT NULL,
+            open_issues INTEGER NOT NULL,
+            position INTEGER NOT NULL
+        ) PARTITION BY RANGE (captured_at);
+        CREATE INDEX IF NOT EXISTS top100_history_captured_at_brin
+            ON top100_history USING brin (captured_at);
+        CREATE INDEX IF NOT EXISTS top100_history_repo_captured_at_idx
+            ON top100_history (repo, captured_at);
+    """
+
+    CREATE_HISTORY_PARTITION = """
+        CREATE TABLE IF NOT EXISTS top100_history_{suffix}
+        PARTITION OF top100_history
+        FOR VALUES FROM ('{start}') TO ('{end}')
+    """
+
+    COPY_HISTORY = """
+        COPY top100_history (captured_at, repo, stars, forks, open_issues, position)
+        FROM STDIN WITH (FORMAT csv)
+    """
+
+    DELETE_DUPLICATE_REPOS = """
+        DELETE FROM top100 a
+        USING top100 b
+        WHERE a.repo = b.repo AND a.ctid < b.ctid
+    """
+
+    CREATE_REPO_UNIQUE_INDEX = """
+        CREATE UNIQUE INDEX IF NOT EXISTS top100_repo_uindex ON top100 (repo)
+    """
+
+    CREATE_TOP100_QUERY_INDEXES = """
+        CREATE INDEX IF NOT EXISTS top100_position_cur_idx ON top100 (position_cur);
+        CREATE INDEX IF NOT EXISTS top100_language_idx ON top100 (lower(language), position_cur);
+        CREATE INDEX IF NOT EXISTS top100_stars_idx ON top100 (stars, repo);
+    """
+
+
+class ResponseCacheQueries(str, Enum):
+    CREATE_TABLE = """
+        CREATE TABLE IF NOT EXISTS responses (
+            url TEXT PRIMARY KEY,
+            etag TEXT,
+            last_modified TEXT,
+            link TEXT,
+            body BLOB NOT NULL,
+            size INTEGER NOT NULL,
+            used_at REAL NOT NULL
+        )
+    """
+
+    CREATE_INDEX = """
+        CREATE INDEX IF NOT EXISTS responses_used_at_idx ON responses (used_at)
+    """
+
+    SELECT = """
+        SELECT etag, last_modified, link, body FROM responses WHERE url = ?
+    """
+
+    TOUCH = """
+        UPDATE responses SET used_at = ? WHERE url = ?
+    """
+
+    UPSERT = """
+        INSERT OR REPLACE INTO responses (url, etag, last_modified, link, body, size, used_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """
+
+    TOTAL_SIZE = """
+        SELECT coalesce(sum(size), 0) FROM responses
+    """
+
+    BY_LAST_USE = """
+        SELECT url, size FROM responses ORDER BY used_at
+    """
+
+    DELETE = """
+        DELETE FROM responses WHERE url = ?
+    """
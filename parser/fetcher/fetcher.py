@@ -1,16 +1,272 @@
+import json
+import logging
+import threading
+import time
+from collections import deque
+from queue import Full, Queue
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+from urllib.parse import quote
+
 from enums.enums import GitHubURL
-from requests import get
+from fetcher.response_cache import CachedResponse, ResponseCache
+from fetcher.token_pool import RateLimitExceeded, TokenPool
+from requests import Response, get
+from requests.utils import parse_header_links
 
 """
 Можно было и не создавать этот класс, а оставить только функцию.
 Тем не менее, возможно, в будущем эти данные надо будет как-то 
 трансформировать или добавить другой функционал,
 поэтому выделил под это отдельный класс
+
+Если передан пул токенов, запрос идёт с токеном, у которого больше всего
+лимита, а при ответе "rate limit exceeded" повторяется с другим токеном.
+Без пула запрос анонимный, как раньше.
+
+iter_pages идёт по страницам поиска (Link rel="next") до max_results
+репозиториев (у поиска гитхаба потолок 1000). prefetch_pages делает то же
+самое в отдельном потоке и держит наготове не больше prefetch страниц,
+так что следующая страница качается, пока предыдущая пишется в базу,
+а памяти занято не больше нескольких страниц.
+
+Больше 1000 репозиториев одним запросом не получить, поэтому при
+max_results > 1000 crawl_shards делит звёзды (от min_stars до максимума)
+на соседние диапазоны. plan_shards спрашивает только total_count
+(per_page=1) и делит пополам каждый диапазон, где больше 1000
+репозиториев, начиная с верхнего, пока найденных диапазонов не хватит
+на max_results. Верхний диапазон открыт сверху (>=low): если у первого
+репозитория прибавились звёзды между планированием и обходом, он
+не выпадет из обхода. Одновременно качается не больше shard_workers диапазонов,
+каждый в своём потоке через тот же пул токенов и в свою очередь
+на prefetch страниц, так что памяти занято не больше
+shard_workers * prefetch страниц при любом размере обхода. Следующий
+диапазон запускается, когда дочитан первый из запущенных. Страницы
+отдаются по порядку диапазонов, от больших звёзд к меньшим, поэтому Loader ставит места сквозным
+счётчиком так же, как для одного запроса. fetch_pages выбирает один
+из двух способов по max_results.
+
+Если передан response_cache, запросы идут с If-None-Match/If-Modified-Since
+из кэша, и на 304 страница собирается из сохранённого тела
+(not_modified=True в странице). Новые ETag копятся в памяти и пишутся
+в кэш только в save_cache, после успешной загрузки: иначе после упавшего
+прогона следующий получил бы 304 на данные, которых нет в базе.
 """
 
+_DONE = object()
+SEARCH_LIMIT = 1000
+
+
+class Page(NamedTuple):
+    data: dict
+    links: dict
+    not_modified: bool
+
 
 class Fetcher:
+    def __init__(
+        self,
+        token_pool: Optional[TokenPool] = None,
+        url: Optional[str] = None,
+        max_results: int = 100,
+        prefetch: int = 1,
+        min_stars: int = 50000,
+        shard_workers: int = 4,
+        response_cache: Optional[ResponseCache] = None,
+    ) -> None:
+        self.token_pool = token_pool
+        self.response_cache = response_cache
+        self._pending_cache = []
+        self.min_stars = min_stars
+        self.url = url or self.search_url(f">{min_stars}")
+        self.max_results = max_results
+        self.prefetch = prefetch
+        self.shard_workers = shard_workers
+        self.fetch_seconds = 0.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def search_url(stars: str, per_page: int = 100) -> str:
+        return GitHubURL.SEARCH_REPOS_URL.value.format(
+            stars=quote(stars, safe="."), per_page=per_page
+        )
+
+    def fetch_pages(self) -> Iterator[dict]:
+        if self.max_results > SEARCH_LIMIT:
+            return self.crawl_shards()
+        return self.prefetch_pages()
+
+    def iter_pages(self, url: Optional[str] = None, max_results: Optional[int] = None) -> Iterator[dict]:
+        url = url or self.url
+        max_results = min(max_results or self.max_results, SEARCH_LIMIT)
+        fetched = 0
+        while url and fetched < max_results:
+            started = time.perf_counter()
+            page = self.fetch(url)
+            with self._lock:
+                self.fetch_seconds += time.perf_counter() - started
+
+            items = page.data["items"][: max_results - fetched]
+            fetched += len(items)
+            yield {**page.data, "items": items, "not_modified": page.not_modified}
+
+            if not items:
+                break
+            url = page.links.get("next", {}).get("url")
+
+    def prefetch_pages(self) -> Iterator[dict]:
+        pages, stop = self.start_prefetch(self.iter_pages())
+        try:
+            yield from pages
+        finally:
+            stop.set()
+
+    def start_prefetch(self, pages: Iterator[dict]) -> Tuple[Iterator[dict], threading.Event]:
+        queue = Queue(maxsize=self.prefetch)
+        stop = threading.Event()
+
+        def put(item) -> bool:
+            while not stop.is_set():
+                try:
+                    queue.put(item, timeout=0.1)
+                    return True
+                except Full:
+                    continue
+            return False
+
+        def produce():
+            try:
+                for page in pages:
+                    if not put(page):
+                        return
+                put(_DONE)
+            except Exception as e:
+                put(e)
+
+        def drain() -> Iterator[dict]:
+            while True:
+                page = queue.get()
+                if page is _DONE:
+                    return
+                if isinstance(page, Exception):
+                    raise page
+                yield page
+
+        threading.Thread(target=produce, daemon=True).start()
+        return drain(), stop
+
+    def count(self, stars: str) -> Tuple[int, Optional[int]]:
+        data = self.fetch(self.search_url(stars, per_page=1)).data
+        items = data["items"]
+        return data["total_count"], items[0]["stargazers_count"] if items else None
+
+    def plan_shards(self) -> List[Tuple[int, Optional[int]]]:
+        total, top_stars = self.count(f">{self.min_stars}")
+        if top_stars is None:
+            return []
+
+        shards, planned = [], 0
+        # Стек: верхний диапазон кладётся последним и достаётся первым
+        pending = [(self.min_stars + 1, top_stars, total)]
+        while pending and planned < self.max_results:
+            low, high, count = pending.pop()
+            if count <= SEARCH_LIMIT or low == high:
+                if count > SEARCH_LIMIT:
+                    logging.warning(
+                        f"{count} repositories have exactly {low} stars, only {SEARCH_LIMIT} are crawled"
+                    )
+                shards.append((low, high))
+                planned += min(count, SEARCH_LIMIT)
+                continue
+            middle = (low + high) // 2
+            lower_count, _ = self.count(f"{low}..{middle}")
+            pending.append((low, middle, lower_count))
+            pending.append((middle + 1, high, max(count - lower_count, 0)))
+        if shards:
+            shards[0] = (shards[0][0], None)
+        return shards
+
+    def crawl_shards(self) -> Iterator[dict]:
+        shards = deque(self.plan_shards())
+        logging.info(f"Crawling {len(shards)} star-range shards")
+        window = deque()
+        remaining = self.max_results
+
+        def fill():
+            while shards and len(window) < self.shard_workers:
+                low, high = shards.popleft()
+                stars = f">={low}" if high is None else f"{low}..{high}"
+                window.append(self.start_prefetch(self.iter_pages(self.search_url(stars), SEARCH_LIMIT)))
+
+        try:
+            fill()
+            while window:
+                pages, _ = window[0]
+                for page in pages:
+                    items = page["items"][:remaining]
+                    remaining -= len(items)
+                    yield {**page, "items": items}
+                    if remaining <= 0:
+                        return
+                window.popleft()
+                fill()
+        finally:
+            for _, stop in window:
+                stop.set()
+
+    def fetch(self, url: str) -> Page:
+        cached = self.response_cache.get(url) if self.response_cache is not None else None
+        headers = {}
+        if cached is not None:
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+
+        response = self.get(url, headers)
+        if cached is not None and response.status_code == 304:
+            return Page(json.loads(cached.body), self.parse_links(cached.link), True)
+
+        data = response.json()
+        etag, last_modified = response.headers.get("ETag"), response.headers.get("Last-Modified")
+        if self.response_cache is not None and response.status_code == 200 and (etag or last_modified):
+            with self._lock:
+                self._pending_cache.append(
+                    (url, CachedResponse(etag, last_modified, response.headers.get("Link"), response.content))
+                )
+        return Page(data, response.links, False)
+
+    def save_cache(self):
+        if self.response_cache is None:
+            return
+        with self._lock:
+            pending, self._pending_cache = self._pending_cache, []
+        for url, cached in pending:
+            self.response_cache.put(url, cached)
+
+    @staticmethod
+    def parse_links(link: Optional[str]) -> dict:
+        # Так же, как Response.links в requests
+        links = {}
+        for parsed in parse_header_links(link or ""):
+            links[parsed.get("rel") or parsed.get("url")] = parsed
+        return links
+
+    def get(self, url: str, headers: Optional[dict] = None) -> Response:
+        headers = headers or {}
+        if self.token_pool is None:
+            return get(url, headers=headers)
+
+        for _ in range(self.token_pool.size + 1):
+            token = self.token_pool.acquire()
+            response = get(url, headers={**headers, "Authorization": f"token {token}"})
+            self.token_pool.update(token, response.headers)
+            if not self.is_rate_limited(response):
+                return response
+            self.token_pool.mark_exhausted(token, response.headers)
+        raise RateLimitExceeded("GitHub API rate limit exceeded for all tokens")
+
     @staticmethod
-    def fetch_repositories() -> dict:
-        response = get(GitHubURL.REPOS_URL.value)
-        return response.json()
+    def is_rate_limited(response: Response) -> bool:
+        if response.status_code == 429:
+            return True
+        return response.status_code == 403 and "rate limit" in response.text.lower()
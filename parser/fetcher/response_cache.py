@@ -0,0 +1,72 @@
+import sqlite3
+import threading
+import time
+from typing import NamedTuple, Optional
+
+from enums.enums import ResponseCacheQueries
+
+"""
+Кэш ответов гитхаба для условных запросов.
+
+Для каждого url хранится ETag, Last-Modified, заголовок Link и тело
+ответа. Fetcher отправляет их в If-None-Match/If-Modified-Since,
+и если гитхаб ответил 304, тело берётся отсюда. 304 не расходует лимит
+и почти ничего не весит.
+
+Хранилище это файл sqlite, поэтому кэш переживает тёплые вызовы функции
+(а на обычной машине и перезапуски). Размер ограничен max_bytes по сумме
+тел: при переполнении удаляются записи, которые дольше всего не
+использовались. Доступ из нескольких потоков закрыт блокировкой.
+"""
+
+
+class CachedResponse(NamedTuple):
+    etag: Optional[str]
+    last_modified: Optional[str]
+    link: Optional[str]
+    body: bytes
+
+
+class ResponseCache:
+    def __init__(self, path: str, max_bytes: int, sql_queries=ResponseCacheQueries):
+        self.max_bytes = max_bytes
+        self.sql_queries = sql_queries
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        with self._connection:
+            self._connection.execute(self.sql_queries.CREATE_TABLE.value)
+            self._connection.execute(self.sql_queries.CREATE_INDEX.value)
+
+    def get(self, url: str) -> Optional[CachedResponse]:
+        with self._lock, self._connection:
+            row = self._connection.execute(self.sql_queries.SELECT.value, (url,)).fetchone()
+            if row is None:
+                return None
+            self._connection.execute(self.sql_queries.TOUCH.value, (time.time(), url))
+        return CachedResponse(*row)
+
+    def put(self, url: str, response: CachedResponse):
+        size = len(response.body)
+        if size > self.max_bytes:
+            return
+        with self._lock, self._connection:
+            self._connection.execute(
+                self.sql_queries.UPSERT.value, (url, *response, size, time.time())
+            )
+            self._evict()
+
+    def _evict(self):
+        total = self._connection.execute(self.sql_queries.TOTAL_SIZE.value).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = []
+        for url, size in self._connection.execute(self.sql_queries.BY_LAST_USE.value):
+            if total <= self.max_bytes:
+                break
+            evicted.append((url,))
+            total -= size
+        self._connection.executemany(self.sql_queries.DELETE.value, evicted)
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
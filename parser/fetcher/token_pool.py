@@ -0,0 +1,116 @@
+import threading
+import time
+from typing import Dict, List, Mapping
+
+
+"""
+Пул токенов гитхаба для парсера, синхронный вариант пула из бэкенда.
+
+По заголовкам X-RateLimit-* из ответов помнит остаток лимита каждого
+токена и отдаёт тот, у которого остаток больше. Когда лимит токена
+подходит к концу, запросы по нему растягиваются до момента сброса.
+Если закончились все токены, ждёт ближайшего сброса, но не дольше max_wait.
+Растягивание тоже не ждёт дольше max_wait, иначе RateLimitExceeded.
+Пока заголовков не было, остаток считается локально от default_limit,
+и исчерпанный счётчик просто заполняется заново.
+"""
+
+
+class RateLimitExceeded(Exception):
+    pass
+
+
+class TokenState:
+    def __init__(self, token: str, limit: int):
+        self.token = token
+        self.limit = limit
+        self.remaining = limit
+        self.reset_at = 0.0
+        self.next_at = 0.0
+
+
+class TokenPool:
+    def __init__(
+        self,
+        tokens: List[str],
+        max_wait: float = 60.0,
+        pace_below: int = 5,
+        default_limit: int = 30,
+    ):
+        self._states: Dict[str, TokenState] = {
+            token: TokenState(token, default_limit) for token in tokens
+        }
+        self._max_wait = max_wait
+        self._pace_below = pace_below
+        self._lock = threading.Lock()
+
+    @property
+    def size(self) -> int:
+        return len(self._states)
+
+    def acquire(self) -> str:
+        while True:
+            with self._lock:
+                now = time.time()
+                for state in self._states.values():
+                    # Без заголовков момент сброса неизвестен, и локальный счётчик
+                    # только прикидка: исчерпав его, считаем лимит снова полным
+                    if state.reset_at <= now and (state.reset_at or state.remaining <= 0):
+                        state.remaining = state.limit
+                        state.reset_at = 0.0
+
+                candidates = [state for state in self._states.values() if state.remaining > 0]
+                if candidates:
+                    state = max(candidates, key=lambda candidate: candidate.remaining)
+                    delay = self._pace(state, now)
+                    state.remaining -= 1
+                else:
+                    state = None
+                    delay = min(state.reset_at for state in self._states.values()) - now
+                    if delay > self._max_wait:
+                        raise RateLimitExceeded("GitHub API rate limit exceeded for all tokens")
+
+            if delay > 0:
+                time.sleep(delay)
+            if state is not None:
+                return state.token
+
+    def _pace(self, state: TokenState, now: float) -> float:
+        if state.remaining >= self._pace_below or state.reset_at <= now:
+            return 0.0
+        interval = (state.reset_at - now) / state.remaining
+        delay = max(state.next_at - now, 0.0)
+        if delay > self._max_wait:
+            raise RateLimitExceeded("GitHub API rate limit pacing delay exceeds max_wait")
+        state.next_at = max(state.next_at, now) + interval
+        return delay
+
+    def update(self, token: str, headers: Mapping[str, str]):
+        with self._lock:
+            state = self._states.get(token)
+            if state is None or "X-RateLimit-Remaining" not in headers:
+                return
+            state.remaining = int(headers["X-RateLimit-Remaining"])
+            state.limit = int(headers.get("X-RateLimit-Limit", state.limit))
+            state.reset_at = float(headers.get("X-RateLimit-Reset", state.reset_at))
+
+    def mark_exhausted(self, token: str, headers: Mapping[str, str]):
+        with self._lock:
+            state = self._states.get(token)
+            if state is None:
+                return
+            state.remaining = 0
+            if "Retry-After" in headers:
+                state.reset_at = time.time() + float(headers["Retry-After"])
+            elif "X-RateLimit-Reset" in headers:
+                state.reset_at = float(headers["X-RateLimit-Reset"])
+            else:
+                state.reset_at = time.time() + 60
+
+    def remaining(self) -> Dict[str, int]:
+        with self._lock:
+            return {state.token: state.remaining for state in self._states.values()}
+
+
+def parse_tokens(value: str) -> List[str]:
+    return [token.strip() for token in value.split(",") if token.strip()]
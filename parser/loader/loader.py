@@ -1,5 +1,11 @@
 import logging
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from itertools import chain
+from typing import Iterable, Iterator
 
+from core.settings import settings
 from db.abc_db import StorageHandler
 from enums.enums import SQLQueries
 from more_itertools import chunked
@@ -10,23 +16,77 @@ from more_itertools import chunked
 
 Ключевой аспект здесь это вставка данных.
 К сожалению, в т/з не было указано о наличии каких-либо индексов.
-Поэтому для избежания дублирования приходится использовать костыль,
-который смльно увеличивает количество запросов к базе.
+Поэтому раньше для избежания дублирования приходилось использовать костыль,
+который сильно увеличивает количество запросов к базе.
 Сначала обновляет данные, а потом уже вставляет,
 в случае, если данных для обновления нет.
-При наличии индекса по имени
-репозиториев такой костыль можно было избежать и загружать данные батчами,
-используя on conflict в запросе.
+
+Теперь уникальный индекс по имени репозитория создаётся в prepare_storage,
+и по умолчанию (bulk=True) данные грузятся одним многострочным INSERT ... ON CONFLICT
+в одной транзакции. Построчный режим (bulk=False) оставлен для сравнения
+в бенчмарке и на случай хранилища без индекса.
+
+Перед записью текущее состояние top100 читается одним запросом.
+Места считаются здесь же, по полученному списку (по убыванию звёзд),
+и пишутся вместе с остальными полями, поэтому отдельного пересчёта
+рейтинга по всей таблице нет. position_prev хранит предыдущее отличающееся место.
+В базу уходят только новые и изменившиеся строки.
+
+Репозитории, которых нет в полученном списке, переносятся в top100_archive,
+если у них меньше звёзд, чем у последнего полученного (ниже порога обхода).
+Пропавший выше порога мог просто перейти между диапазонами обхода, пока
+тот шёл, поэтому он только снимается с места (position_cur = 0) и
+в архив уходит, если не найдётся и в следующем прогоне.
+process_data возвращает, сколько строк вставлено, обновлено, пропущено и
+перенесено в архив.
+
+Каждый прогон дописывает снимок (звёзды, форки, issues, место) всех
+репозиториев в таблицу истории top100_history через COPY. Ключ repo
+в истории в нижнем регистре, как и в хранилище активности бэкенда.
+
+В конце загрузки отправляется NOTIFY, по которому бэкенд перечитывает
+свой кэш топ100.
+
+Данные можно отдавать постранично (process_pages): состояние читается
+один раз, места считаются сквозным счётчиком (страницы поиска уже
+отсортированы по звёздам), каждая страница пишется сразу, а архивация
+и NOTIFY выполняются один раз в конце. process_data это тот же прогон
+для одной страницы.
+
+process_fetched принимает страницы прямо из Fetcher. Если все страницы
+пришли как 304 (not_modified), выдача с прошлого прогона не поменялась,
+и загрузка пропускается целиком: ни записи, ни истории, ни NOTIFY.
+Пока не пришла изменённая страница, неизменённые копятся в памяти,
+дальше всё идёт обычным потоком через process_pages.
+
+Время каждого этапа последнего прогона лежит в timings,
+чтобы его можно было отдать в лог, метрики или бенчмарк.
 """
 
 
 class Loader:
     def __init__(
-        self, storage_handler: StorageHandler, batch_size=20, sql_queries=SQLQueries
+        self,
+        storage_handler: StorageHandler,
+        batch_size=1000,
+        sql_queries=SQLQueries,
+        bulk=True,
+        notify_channel=settings.top100_channel,
     ) -> None:
         self.storage_handler = storage_handler
         self.batch_size = batch_size
         self.sql_queries = sql_queries
+        self.bulk = bulk
+        self.notify_channel = notify_channel
+        self.timings = {}
+
+    @contextmanager
+    def timed(self, stage: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[stage] = self.timings.get(stage, 0.0) + time.perf_counter() - started
 
     @staticmethod
     def transform_data(data: dict) -> list:
@@ -54,43 +114,169 @@ class Loader:
             )
             raise
 
+    def transform_pages(self, pages: Iterable[dict]) -> Iterator[list]:
+        for page in pages:
+            with self.timed("transform"):
+                data = self.transform_data(page)
+            yield data
+
     def process_batch(self, batch: list):
         for item in batch:
             try:
-                rowcount = self.storage_handler.execute_update(
-                    self.sql_queries.UPDATE_REPO.value,
-                    (
-                        item[1],
-                        item[2],
-                        item[3],
-                        item[4],
-                        item[5],
-                        item[6],
-                        item[8],
-                        item[0],
-                    ),
-                )
-
-                if rowcount == 0:
-                    self.storage_handler.execute(
-                        self.sql_queries.INSERT_REPO.value, (*item,)
-                    )
+                self.storage_handler.upsert_repo(item)
             except Exception as e:
                 logging.error(f"Error during batch processing: {e}")
                 raise
 
-    def update_positions(self):
+    def load_state(self) -> dict:
+        try:
+            rows = self.storage_handler.execute_query(self.sql_queries.SELECT_REPOS.value, ())
+        except Exception as e:
+            logging.error(f"Error during state loading: {e}")
+            raise
+        return {row[0]: tuple(row[1:]) for row in rows}
+
+    @staticmethod
+    def rank(data: list, state: dict, start: int = 1) -> list:
+        unique_items = {item[0]: item for item in data}.values()
+        ranked = []
+        for position, item in enumerate(
+            sorted(unique_items, key=lambda item: item[2], reverse=True), start=start
+        ):
+            current = state.get(item[0])
+            if current is None:
+                position_prev = 0
+            elif current[7] == 0:
+                # Снят с места в прошлом прогоне, предыдущее место уже в position_prev
+                position_prev = current[6]
+            elif current[7] != position:
+                position_prev = current[7]
+            else:
+                position_prev = current[6]
+            ranked.append((*item[:7], position_prev, position))
+        return ranked
+
+    @staticmethod
+    def detect_changes(ranked: list, state: dict) -> tuple:
+        inserted, updated, skipped = [], [], 0
+        for item in ranked:
+            current = state.get(item[0])
+            if current is None:
+                inserted.append(item)
+            elif current != tuple(item[1:]):
+                updated.append(item)
+            else:
+                skipped += 1
+        return inserted, updated, skipped
+
+    def process_bulk(self, data: list):
+        # ON CONFLICT не может обновить одну строку дважды за запрос,
+        # поэтому дубликаты внутри выборки схлопываем заранее
+        unique_items = list({item[0]: item for item in data}.values())
         try:
-            self.storage_handler.execute(self.sql_queries.UPDATE_POSITIONS.value, ())
+            self.storage_handler.upsert_repos(unique_items, self.batch_size)
         except Exception as e:
-            logging.error(f"Error during update_positions operation: {e}")
+            logging.error(f"Error during bulk processing: {e}")
             raise
 
-    def process_data(self, data: list):
+    def archive_dropped(self, repos: set, floor: int) -> int:
+        if not repos:
+            return 0
         try:
-            for batch in chunked(data, self.batch_size):
-                self.process_batch(batch)
-            self.update_positions()
+            archived = self.storage_handler.execute_update(
+                self.sql_queries.ARCHIVE_DROPPED_REPOS.value, (list(repos), floor)
+            )
+            unranked = self.storage_handler.execute_update(
+                self.sql_queries.UNRANK_MISSING_REPOS.value, (list(repos),)
+            )
+        except Exception as e:
+            logging.error(f"Error during archive operation: {e}")
+            raise
+        if unranked:
+            logging.warning(f"{unranked} repositories above {floor} stars are missing, unranked until next run")
+        return archived
+
+    def snapshot_history(self, ranked: list, captured_at: datetime):
+        try:
+            self.storage_handler.copy(
+                self.sql_queries.COPY_HISTORY.value,
+                [
+                    (captured_at.isoformat(), item[0].lower(), item[2], item[4], item[5], item[8])
+                    for item in ranked
+                ],
+            )
+        except Exception as e:
+            logging.error(f"Error during history snapshot: {e}")
+            raise
+
+    def notify_updated(self):
+        try:
+            self.storage_handler.execute(
+                self.sql_queries.NOTIFY_UPDATED.value, (self.notify_channel, "")
+            )
+        except Exception as e:
+            logging.error(f"Error during notify operation: {e}")
+            raise
+
+    def process_fetched(self, pages: Iterable[dict]) -> dict:
+        pages = iter(pages)
+        unchanged = []
+        for page in pages:
+            unchanged.append(page)
+            if not page.get("not_modified"):
+                break
+        else:
+            if unchanged:
+                self.timings = {}
+                skipped = sum(len(page["items"]) for page in unchanged)
+                logging.info("Search results are not modified since the last run, skipping load")
+                return {"inserted": 0, "updated": 0, "skipped": skipped, "archived": 0}
+        return self.process_pages(self.transform_pages(chain(unchanged, pages)))
+
+    def process_data(self, data: list) -> dict:
+        return self.process_pages([data])
+
+    def process_pages(self, pages: Iterable[list]) -> dict:
+        self.timings = {}
+        stats = {"inserted": 0, "updated": 0, "skipped": 0, "archived": 0}
+        seen = set()
+        floor = None
+        captured_at = datetime.now(timezone.utc)
+        try:
+            with self.timed("load_state"):
+                state = self.load_state()
+                self.storage_handler.ensure_history_partition(captured_at)
+
+            for data in pages:
+                with self.timed("rank"):
+                    ranked = self.rank(
+                        [item for item in data if item[0] not in seen], state, start=len(seen) + 1
+                    )
+                    seen.update(item[0] for item in ranked)
+                    if ranked:
+                        floor = ranked[-1][2] if floor is None else min(floor, ranked[-1][2])
+                    inserted, updated, skipped = self.detect_changes(ranked, state)
+                    changed = inserted + updated
+                with self.timed("upsert"):
+                    if self.bulk:
+                        if changed:
+                            self.process_bulk(changed)
+                    else:
+                        for batch in chunked(changed, self.batch_size):
+                            self.process_batch(batch)
+                with self.timed("history"):
+                    self.snapshot_history(ranked, captured_at)
+                stats["inserted"] += len(inserted)
+                stats["updated"] += len(updated)
+                stats["skipped"] += skipped
+
+            with self.timed("archive"):
+                stats["archived"] = self.archive_dropped(seen, floor)
+            with self.timed("notify"):
+                self.notify_updated()
         except Exception as e:
             logging.error(f"Error during data processing: {e}")
             raise
+
+        logging.info(f"Rows written: {stats}")
+        return stats
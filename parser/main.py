@@ -1,37 +1,115 @@
 import json
 import logging
+import time
 
-import psycopg2
-from db.postgres import PostgresHandler
-from fetcher.fetcher import Fetcher
-from loader.loader import Loader
+_instance_started = time.perf_counter()
 
 logging.basicConfig(level=logging.INFO)
 
 """
-Точка входа парсера. Добавил обработку возможных ошибок, а также 
+Точка входа парсера. Добавил обработку возможных ошибок, а также
 небольшое логгирование, для отслеживания работы скрипта.
+В конце прогона метрики (время этапов, записанные строки, повторы и
+переподключения к базе) отправляются в Pushgateway и попадают в ответ.
+
+Функция живёт в облаке, и между вызовами экземпляр может оставаться
+тёплым. Поэтому обработчик базы с пулом соединений хранится на уровне
+модуля: тёплый вызов проверяет пул через SELECT 1 и переиспользует его,
+а prepare_storage выполняется только при создании нового пула.
+Тяжёлые модули (psycopg2, requests, pydantic-настройки) импортируются
+внутри первого вызова, а не при загрузке модуля. Сколько ушло на импорты
+и подключение и был ли старт холодным, видно в metrics.startup ответа.
+
+Ответы поиска кэшируются в sqlite (GH_CACHE_PATH) для условных
+запросов. Новые ETag сохраняются только после успешной загрузки.
+
+С "profile": true в событии (или PROFILE_RUNS=true) прогон профилируется,
+профиль и время по этапам пишутся в PROFILE_DIR (см. core/profiling.py).
 """
 
+_db_handler = None
+_invocations = 0
+
+
+def get_db_handler():
+    global _db_handler
+    from db.postgres import PostgresHandler
+
+    if _db_handler is not None:
+        if _db_handler.is_alive():
+            _db_handler.reset_counters()
+            return _db_handler
+        logging.info("Cached connection pool is stale, reconnecting...")
+        _db_handler.close()
+        _db_handler = None
 
-def handler(event, context):
     db_handler = PostgresHandler()
-    loader = Loader(db_handler)
-    fetcher = Fetcher()
+    logging.info("Preparing storage...")
+    db_handler.prepare_storage()
+    _db_handler = db_handler
+    return db_handler
 
-    try:
-        logging.info("Fetching repositories...")
-        data = fetcher.fetch_repositories()
 
-        logging.info("Transforming data...")
-        transformed_data = loader.transform_data(data)
+def handler(event, context):
+    global _invocations
+    _invocations += 1
+    started = time.perf_counter()
+    startup = {
+        "cold_start": int(_invocations == 1),
+        "invocation": _invocations,
+        "instance_age_seconds": round(started - _instance_started, 4),
+        "import_seconds": 0.0,
+        "setup_seconds": 0.0,
+    }
+
+    from psycopg2 import DatabaseError
+    from core.metrics import build_run_metrics, push_run_metrics
+    from core.profiling import RunProfiler, profile_requested
+    from core.settings import settings
+    from fetcher.fetcher import Fetcher
+    from fetcher.response_cache import ResponseCache
+    from fetcher.token_pool import TokenPool, parse_tokens
+    from loader.loader import Loader
+
+    startup["import_seconds"] = round(time.perf_counter() - started, 4)
+
+    profiler = None
+    if profile_requested(event, settings.profile_runs):
+        profiler = RunProfiler(settings.profile_dir, settings.profile_interval)
+        profiler.start()
 
-        logging.info("Processing data...")
-        loader.process_data(transformed_data)
+    db_handler = None
+    response_cache = None
+    success = False
+    fetch_seconds = 0.0
+    stage_seconds = {}
+    stats = {}
+
+    try:
+        db_handler = get_db_handler()
+        loader = Loader(db_handler)
+        tokens = parse_tokens(settings.gh_auth_token)
+        if settings.gh_cache_path:
+            response_cache = ResponseCache(settings.gh_cache_path, settings.gh_cache_max_bytes)
+        fetcher = Fetcher(
+            TokenPool(tokens, max_wait=settings.gh_rate_limit_max_wait) if tokens else None,
+            max_results=settings.gh_max_results,
+            min_stars=settings.gh_min_stars,
+            shard_workers=settings.gh_shard_workers,
+            response_cache=response_cache,
+        )
+        startup["setup_seconds"] = round(time.perf_counter() - started, 4)
+
+        logging.info("Fetching and processing repositories...")
+        stats = loader.process_fetched(fetcher.fetch_pages())
+        fetcher.save_cache()
+        fetch_seconds = fetcher.fetch_seconds
+        stage_seconds.update(loader.timings)
 
         logging.info("Data processing completed successfully.")
+        success = True
 
-    except psycopg2.DatabaseError as db_error:
+    except DatabaseError as db_error:
         logging.error(f"Database error occurred: {db_error}")
         return {
             "statusCode": 500,
@@ -58,11 +136,23 @@ def handler(event, context):
             ),
         }
 
+    finally:
+        if response_cache is not None:
+            response_cache.close()
+        run_metrics = build_run_metrics(
+            success, fetch_seconds, stage_seconds, stats, db_handler, startup
+        )
+        if profiler is not None:
+            run_metrics["profile"] = profiler.finish(run_metrics)
+        push_run_metrics(run_metrics)
+
     return {
         "statusCode": 200,
         "body": json.dumps(
             {
                 "message": "Data processing completed successfully",
+                "stats": stats,
+                "metrics": run_metrics,
                 "event": event,
                 "context": context,
             },